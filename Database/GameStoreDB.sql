@@ -20,6 +20,7 @@ CREATE TABLE Games (
     title NVARCHAR(150) NOT NULL,
     description NVARCHAR(MAX) NULL, -- MAX allows for very long text, NULL allows it to be empty
     price DECIMAL(10, 2) NOT NULL CHECK (price >= 0), -- Price must be a positive value
+    sale_price DECIMAL(10, 2) NULL, -- Set while a scheduled price rule is running (backend/pricing.py)
     genre NVARCHAR(50) NULL,
     platform NVARCHAR(50) NULL,
     release_date DATE NULL, -- Storing only the date part
@@ -59,7 +60,7 @@ CREATE TABLE Orders (
     user_id INT NOT NULL,
     order_date DATETIME2 NOT NULL DEFAULT GETDATE(),
     total_amount DECIMAL(12, 2) NOT NULL DEFAULT 0.00 CHECK (total_amount >= 0),
-    status VARCHAR(50) NOT NULL DEFAULT 'Pending' CHECK (status IN ('Pending', 'Awaiting Payment', 'Processing', 'Shipped', 'Delivered', 'Cancelled')),
+    status VARCHAR(50) NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'paid', 'processing', 'shipped', 'delivered', 'cancelled')), -- see crud.ORDER_TRANSITIONS
     shipping_address NVARCHAR(500) NULL, -- A single field for simplified address input
     updated_at DATETIME2 NOT NULL DEFAULT GETDATE(),
 
@@ -67,6 +68,10 @@ CREATE TABLE Orders (
 );
 GO
 
+-- Fulfilment workers claim the oldest paid orders (crud.claim_paid_orders)
+CREATE INDEX ix_Orders_status_order_date ON Orders (status, order_date);
+GO
+
 -- Optional: Trigger to update 'updated_at' on the Orders table
 CREATE TRIGGER trg_Orders_Update_UpdatedAt
 ON Orders
@@ -0,0 +1,207 @@
+import argparse
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+import logging
+from typing import List, Optional
+
+from sqlalchemy import delete, desc, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from backend import models
+from .database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+#==============================================================================
+# Sales analytics backed by the SalesDaily rollup table
+#
+# Every checkout and payment adds its units and revenue to one row per
+# (day, game), so the admin reports only ever scan days x games rows instead
+# of the whole OrderItems table. `backfill` rebuilds the table from history.
+#==============================================================================
+
+def _add_to_rollup(db: Session, day: date, game_id: int, genre: Optional[str], **amounts):
+    """
+    Add `amounts` (column -> increment) to the (day, game) rollup row in one
+    UPDATE, so concurrent jobs never lose each other's increments. A missing row
+    is inserted; if another worker inserts it first, the UPDATE is retried.
+    """
+    rollup = models.SalesRollup
+    add = (
+        update(rollup)
+        .where(rollup.day == day, rollup.game_id == game_id)
+        .values({column: getattr(rollup, column) + amount for column, amount in amounts.items()})
+        .execution_options(synchronize_session=False)
+    )
+    for _ in range(3):
+        if db.execute(add).rowcount == 1:
+            return
+        row = {"units_ordered": 0, "revenue_ordered": Decimal(0), "units_paid": 0, "revenue_paid": Decimal(0), **amounts}
+        try:
+            with db.begin_nested():  # a savepoint, so a lost insert race doesn't abort the caller's transaction
+                db.execute(insert(rollup).values(day=day, game_id=game_id, genre=genre, **row))
+            return
+        except IntegrityError:
+            continue
+    raise RuntimeError(f"Could not update the sales rollup for game {game_id} on {day}")
+
+
+def record_order(db: Session, order: models.Order, order_items: List[models.OrderItem], games: dict):
+    """
+    Add an order's line items to the rollups. `games` maps game_id to the
+    Game rows already loaded by the caller. The caller commits.
+    """
+    day = order.order_date.date()
+    for item in order_items:
+        game = games.get(item.game_id)
+        _add_to_rollup(
+            db, day, item.game_id, game.genre if game else None,
+            units_ordered=item.quantity, revenue_ordered=item.price_at_purchase * item.quantity,
+        )
+
+
+def record_payment(db: Session, order: models.Order, payment: models.Payment):
+    """
+    Move a paid order's line items into the paid columns for the payment day.
+    The caller commits.
+    """
+    day = payment.payment_date.date()
+    for item in order.order_items:
+        _add_to_rollup(
+            db, day, item.game_id, item.game.genre if item.game else None,
+            units_paid=item.quantity, revenue_paid=item.price_at_purchase * item.quantity,
+        )
+
+
+#==============================================================================
+# Reports (read the rollups only)
+#==============================================================================
+
+TOP_SELLER_METRICS = ("units", "revenue")
+
+
+def top_sellers(db: Session, start: date, end: date, limit: int = 10, metric: str = "units") -> List[dict]:
+    if metric not in TOP_SELLER_METRICS:
+        raise ValueError(f"Unknown metric '{metric}'")
+    units = func.sum(models.SalesRollup.units_ordered).label("units")
+    revenue = func.sum(models.SalesRollup.revenue_ordered).label("revenue")
+    statement = (
+        select(models.SalesRollup.game_id, models.Game.title, units, revenue)
+        .join(models.Game, models.Game.game_id == models.SalesRollup.game_id)
+        .where(models.SalesRollup.day >= start, models.SalesRollup.day <= end)
+        .group_by(models.SalesRollup.game_id, models.Game.title)
+        .order_by(desc(revenue if metric == "revenue" else units))
+        .limit(limit)
+    )
+    return [row._asdict() for row in db.execute(statement)]
+
+
+def revenue_over_time(db: Session, start: date, end: date, genre: Optional[str] = None) -> List[dict]:
+    statement = (
+        select(
+            models.SalesRollup.day,
+            func.sum(models.SalesRollup.units_ordered).label("units"),
+            func.sum(models.SalesRollup.revenue_ordered).label("revenue"),
+            func.sum(models.SalesRollup.revenue_paid).label("revenue_paid"),
+        )
+        .where(models.SalesRollup.day >= start, models.SalesRollup.day <= end)
+        .group_by(models.SalesRollup.day)
+        .order_by(models.SalesRollup.day)
+    )
+    if genre:
+        statement = statement.where(models.SalesRollup.genre == genre)
+    return [row._asdict() for row in db.execute(statement)]
+
+
+def inventory_turnover(db: Session, start: date, end: date, limit: int = 100) -> List[dict]:
+    """
+    Units sold in the window divided by average inventory, approximated as
+    the mean of the opening stock (current + sold) and the current stock.
+    """
+    sold = (
+        select(
+            models.SalesRollup.game_id,
+            func.sum(models.SalesRollup.units_ordered).label("units_sold"),
+        )
+        .where(models.SalesRollup.day >= start, models.SalesRollup.day <= end)
+        .group_by(models.SalesRollup.game_id)
+        .subquery()
+    )
+    statement = (
+        select(models.Game.game_id, models.Game.title, models.Game.stock_quantity, sold.c.units_sold)
+        .join(sold, sold.c.game_id == models.Game.game_id)
+        .order_by(desc(sold.c.units_sold))
+        .limit(limit)
+    )
+    results = []
+    for row in db.execute(statement):
+        average_inventory = row.stock_quantity + row.units_sold / 2
+        results.append({
+            "game_id": row.game_id,
+            "title": row.title,
+            "units_sold": row.units_sold,
+            "stock_quantity": row.stock_quantity,
+            "turnover": round(row.units_sold / average_inventory, 4) if average_inventory else None,
+        })
+    return results
+
+
+#==============================================================================
+# Backfill
+#==============================================================================
+
+def backfill(db: Session, chunk_size: int = 5000) -> int:
+    """
+    Rebuild SalesDaily from Orders, OrderItems and Payments. History is read
+    in yield_per chunks and aggregated in Python, which keeps the query
+    dialect-neutral; only the (day, game) totals are held in memory.
+    Returns the number of rollup rows written.
+    """
+    totals = defaultdict(lambda: {"genre": None, "units_ordered": 0, "revenue_ordered": Decimal(0),
+                                  "units_paid": 0, "revenue_paid": Decimal(0)})
+    statement = (
+        select(
+            models.Order.order_date,
+            models.Payment.payment_date,
+            models.Payment.payment_status,
+            models.OrderItem.game_id,
+            models.Game.genre,
+            models.OrderItem.quantity,
+            models.OrderItem.price_at_purchase,
+        )
+        .join(models.Order, models.Order.order_id == models.OrderItem.order_id)
+        .join(models.Game, models.Game.game_id == models.OrderItem.game_id)
+        .outerjoin(models.Payment, models.Payment.order_id == models.Order.order_id)
+    )
+    result = db.execute(statement, execution_options={"yield_per": chunk_size})
+    for row in result:
+        line_total = row.price_at_purchase * row.quantity
+        ordered = totals[(row.order_date.date(), row.game_id)]
+        ordered["genre"] = row.genre
+        ordered["units_ordered"] += row.quantity
+        ordered["revenue_ordered"] += line_total
+        if row.payment_status == "Success":
+            paid = totals[(row.payment_date.date(), row.game_id)]
+            paid["genre"] = row.genre
+            paid["units_paid"] += row.quantity
+            paid["revenue_paid"] += line_total
+
+    db.execute(delete(models.SalesRollup))
+    db.add_all(models.SalesRollup(day=day, game_id=game_id, **values) for (day, game_id), values in totals.items())
+    db.commit()
+    logger.info("Rebuilt %s SalesDaily rows", len(totals))
+    return len(totals)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sales analytics maintenance")
+    parser.add_argument("command", choices=["backfill"])
+    args = parser.parse_args()
+
+    session = SessionLocal()
+    try:
+        backfill(session)
+    finally:
+        session.close()
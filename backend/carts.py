@@ -0,0 +1,109 @@
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from backend import models, pricing, reservations
+
+logger = logging.getLogger(__name__)
+
+#==============================================================================
+# Server-computed cart summary
+#
+# One query returns every line; line totals and the subtotal use the sale
+# prices from the in-memory price table (backend/pricing.py). The summary is
+# not cached: availability depends on other users' carts and on stock, which
+# any worker process can change, and one query is as cheap as a version check.
+#==============================================================================
+
+# Cart items older than this are treated as abandoned and swept
+CART_TTL_HOURS = float(os.getenv("CART_TTL_HOURS", "72"))
+CART_SWEEP_INTERVAL = int(os.getenv("CART_SWEEP_INTERVAL", "600"))  # seconds
+CART_SWEEP_BATCH = int(os.getenv("CART_SWEEP_BATCH", "500"))
+
+
+def cart_cutoff() -> datetime:
+    """Items created before this moment have expired."""
+    return datetime.utcnow() - timedelta(hours=CART_TTL_HOURS)
+
+
+def get_summary(db: Session, user_id: int) -> dict:
+    held = reservations.held_by_game(exclude_user=user_id)  # stock held in other users' carts
+    statement = (
+        select(
+            models.CartItem.id,
+            models.CartItem.game_id,
+            models.CartItem.quantity,
+            models.Game.title,
+            models.Game.price,
+            models.Game.image_url,
+            models.Game.stock_quantity,
+            held.c.held,
+        )
+        .join(models.Game, models.Game.game_id == models.CartItem.game_id)
+        .outerjoin(held, held.c.game_id == models.CartItem.game_id)
+        .where(models.CartItem.user_id == user_id, models.CartItem.created_at >= cart_cutoff())
+        .order_by(models.CartItem.id)
+    )
+    rows = db.execute(statement).all()
+    pricing.prices.maybe_reload()
+    lines = []
+    for row in rows:
+        # Same price table as checkout, so the summary total is what the order will charge
+        price = pricing.prices.effective_price(row.game_id, row.price)
+        lines.append({
+            "id": row.id,
+            "game_id": row.game_id,
+            "title": row.title,
+            "image_url": row.image_url,
+            "price": price,
+            "list_price": row.price,
+            "quantity": row.quantity,
+            "line_total": price * row.quantity,
+            "stock_quantity": row.stock_quantity,
+            # Same check as checkout: stock held in other users' carts is not for sale
+            "available": reservations.available(row.stock_quantity, row.held) >= row.quantity,
+        })
+    return {
+        "items": lines,
+        "item_count": sum(line["quantity"] for line in lines),
+        "subtotal": sum((line["line_total"] for line in lines), 0),
+        "all_available": all(line["available"] for line in lines),
+    }
+
+
+#==============================================================================
+# Expired cart cleanup
+#==============================================================================
+
+def sweep_expired(db: Session, batch_size: int = CART_SWEEP_BATCH, max_batches: Optional[int] = None) -> int:
+    """
+    Delete expired cart items in batches of `batch_size`, committing after
+    each batch so locks stay short. Returns the number of rows deleted.
+    """
+    cutoff = cart_cutoff()
+    deleted = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        rows = db.execute(
+            select(models.CartItem.id)
+            .where(models.CartItem.created_at < cutoff)
+            .order_by(models.CartItem.created_at)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        # Re-check the age: add_to_cart may have refreshed a row since the SELECT
+        result = db.execute(
+            delete(models.CartItem)
+            .where(models.CartItem.id.in_([row.id for row in rows]), models.CartItem.created_at < cutoff)
+        )
+        db.commit()
+        deleted += result.rowcount
+        batches += 1
+    if deleted:
+        logger.info("Swept %s expired cart item(s)", deleted)
+    return deleted
@@ -0,0 +1,147 @@
+import os
+import zlib
+from functools import lru_cache
+
+#==============================================================================
+# Response compression
+#
+# Negotiates brotli (when the optional `brotli` package is installed) or gzip
+# from Accept-Encoding, for compressible responses of at least
+# COMPRESS_MIN_SIZE bytes. Streaming responses are compressed chunk by chunk
+# with a flush after each, so exports still arrive incrementally. Partial
+# (206) responses are passed through untouched. brotli is imported on first
+# use, not at startup.
+#==============================================================================
+
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+
+COMPRESSIBLE_TYPES = (
+    "text/html", "text/css", "text/plain", "text/csv", "text/javascript",
+    "application/json", "application/javascript", "application/x-ndjson", "application/msgpack",
+)
+
+
+@lru_cache(maxsize=None)
+def _brotli():
+    """The brotli module, or None when it is not installed."""
+    try:  # Optional: pip install brotli
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def _accepted_encoding(scope) -> str:
+    """Pick br or gzip by the client's q-values ("gzip;q=0" refuses gzip); "" when neither is acceptable."""
+    qualities = {}
+    for name, value in scope.get("headers", []):
+        if name == b"accept-encoding":
+            for part in value.decode("latin-1").lower().split(","):
+                coding, _, params = part.partition(";")
+                quality = 1.0
+                for param in params.split(";"):
+                    key, _, number = param.strip().partition("=")
+                    if key == "q":
+                        try:
+                            quality = float(number)
+                        except ValueError:
+                            quality = 0.0
+                qualities[coding.strip()] = quality
+    best, best_quality = "", 0.0
+    if not qualities:
+        return ""
+    for coding in (("br", "gzip") if _brotli() is not None else ("gzip",)):
+        quality = qualities.get(coding, qualities.get("*", 0.0))
+        if quality > best_quality:  # ties go to the first, brotli
+            best, best_quality = coding, quality
+    return best
+
+
+class _Compressor:
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._brotli = _brotli().Compressor(quality=BROTLI_QUALITY)
+            self._zlib = None
+        else:
+            self._brotli = None
+            self._zlib = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # wbits=31 -> gzip container
+
+    def chunk(self, data: bytes) -> bytes:
+        if self._brotli:
+            return self._brotli.process(data) + self._brotli.flush()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        if self._brotli:
+            return self._brotli.process(data) + self._brotli.finish()
+        return self._zlib.compress(data) + self._zlib.flush()
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = COMPRESS_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        encoding = _accepted_encoding(scope) if scope["type"] == "http" else ""
+        if not encoding:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        compressor = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, compressor, passthrough
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                headers = {name.lower(): value for name, value in message.get("headers", [])}
+                content_type = headers.get(b"content-type", b"").decode("latin-1")
+                # Partial content: Content-Range counts bytes of the uncompressed body
+                partial = message["status"] == 206 or b"content-range" in headers
+                if partial or b"content-encoding" in headers or not content_type.startswith(COMPRESSIBLE_TYPES):
+                    passthrough = True
+                    await send(message)
+                else:
+                    start_message = message  # held back until we see the body
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if start_message is not None:
+                if not more_body and len(body) < self.minimum_size:
+                    # Small, complete response: not worth compressing
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+                compressor = _Compressor(encoding)
+                vary = [value for name, value in start_message["headers"] if name.lower() == b"vary"]
+                headers = [
+                    (name, value) for name, value in start_message["headers"]
+                    if name.lower() not in (b"content-length", b"vary")
+                ]
+                headers += [
+                    (b"content-encoding", encoding.encode()),
+                    (b"vary", b", ".join(vary + [b"Accept-Encoding"])),
+                ]
+                if more_body:
+                    body = compressor.chunk(body)
+                else:
+                    body = compressor.finish(body)
+                    headers.append((b"content-length", str(len(body)).encode()))
+                await send({**start_message, "headers": headers})
+                start_message = None
+                await send({"type": "http.response.body", "body": body, "more_body": more_body})
+                return
+
+            body = compressor.chunk(body) if more_body else compressor.finish(body)
+            await send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
@@ -1,11 +1,21 @@
+import logging
+import os
 from backend import models, schemas
 from . import models, schemas
+from backend import jobs
+from backend.events import catalog_feed, publish_game
+from backend import carts, pricing, reservations
 from backend.security import get_password_hash
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime
 from decimal import Decimal
 from fastapi import HTTPException, status
 from typing import List, Optional
 
+logger = logging.getLogger(__name__)
+
 #==============================================================================
 # Function to get a game by its ID
 #==============================================================================
@@ -37,10 +47,15 @@ def create_game(db: Session, game: schemas.GameCreate):
     )
     db.add(db_game)
     try:
+        db.flush()
+        pricing.reprice(db, models.Game.game_id == db_game.game_id)  # a running genre/platform sale covers new titles too
         db.commit()
         print(f"--- CRUD: Game '{game.title}' commit attempted successfully.") # DEBUG
         db.refresh(db_game) # Refresh to get DB-generated values like game_id, created_at
+        if db_game.sale_price is not None:
+            pricing.prices.reload(db)
         print(f"--- CRUD: Game '{game.title}' refreshed. ID: {db_game.game_id}, Created At: {db_game.created_at}") # DEBUG
+        publish_game("game.created", db_game)
         return db_game
     except Exception as e:
         print(f"--- CRUD: ERROR during commit/refresh for game '{game.title}': {str(e)}") # DEBUG
@@ -65,8 +80,16 @@ def update_game(db: Session, game_id: int, game_update: schemas.GameUpdate):
     # or the database trigger. If you want SQLAlchemy to manage it explicitly here:
     # db_game.updated_at = datetime.utcnow()
 
+    # The sale price follows the list price, genre and platform
+    repriced = update_data.keys() & {"price", "genre", "platform"}
+    if repriced:
+        db.flush()
+        pricing.reprice(db, models.Game.game_id == game_id)
     db.commit()
     db.refresh(db_game)
+    if repriced:
+        pricing.prices.reload(db)
+    publish_game("game.updated", db_game, fields=update_data.keys())
     return db_game
 #==============================================================================
 # Function to delete a game
@@ -79,6 +102,7 @@ def delete_game(db: Session, game_id: int):
 
     db.delete(db_game)
     db.commit()
+    catalog_feed.publish({"type": "game.deleted", "game_id": game_id})
     return db_game # Return the deleted game data (or just True for success)
 
 
@@ -139,15 +163,23 @@ def create_order(db: Session, order: schemas.OrderCreate) -> models.Order:
     """
     Create a new order and its associated order items.
     """
-    # Calculate the total price of the order.
+    # Calculate the total price of the order, at sale prices where a price rule is running.
+    pricing.prices.ensure_loaded(db)
     total_price = Decimal(0)
+    unit_prices = {}
+    held = reservations.held_quantities(db, [item.game_id for item in order.order_items], exclude_user=order.user_id)
     for item in order.order_items:
+        if item.quantity <= 0:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Quantity for game {item.game_id} must be at least 1")
         game = db.query(models.Game).get(item.game_id)
         if not game:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Game with id {item.game_id} not found")
-        if item.quantity > game.stock_quantity:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Not enough stock for game {game.title} (id: {game.game_id}).  Requested {item.quantity}, available {game.stock_quantity}")
-        total_price += game.price * item.quantity
+        # Stock held in other users' carts is not for sale
+        available = reservations.available(game.stock_quantity, held.get(game.game_id))
+        if item.quantity > available:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Not enough stock for game {game.title} (id: {game.game_id}).  Requested {item.quantity}, available {available}")
+        unit_prices[game.game_id] = pricing.prices.effective_price(game.game_id, game.price)
+        total_price += unit_prices[game.game_id] * item.quantity
 
     # Create the order.
     db_order = models.Order(
@@ -159,21 +191,36 @@ def create_order(db: Session, order: schemas.OrderCreate) -> models.Order:
     db.flush()  # Need to flush to get the order_id
 
     # Create the order items.
+    games = []
     for item in order.order_items:
         game = db.query(models.Game).get(item.game_id) #get game again
         db_order_item = models.OrderItem(
             order_id=db_order.order_id,
             game_id=item.game_id,
             quantity=item.quantity,
-            price=game.price,  # Current price
-            price_at_purchase=game.price,  # Store the price at the time of order
+            price=game.price,  # Current list price
+            price_at_purchase=unit_prices[game.game_id],  # Price charged, sale included
         )
         db.add(db_order_item)
-        game.stock_quantity -= item.quantity #reduce stock
-        db.add(game)
+        # Reduce stock with a conditional UPDATE, so two concurrent orders can't both take the last units
+        reserved = db.execute(
+            update(models.Game)
+            .where(models.Game.game_id == item.game_id, models.Game.stock_quantity >= item.quantity)
+            .values(stock_quantity=models.Game.stock_quantity - item.quantity)
+            .execution_options(synchronize_session=False)
+        )
+        if reserved.rowcount != 1:
+            db.rollback()
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Not enough stock for game {game.title} (id: {game.game_id}); it was just sold out")
+        games.append(game)
+
+    # Follow-up work (analytics) runs on the job queue once the order commits
+    jobs.enqueue(db, "order.created", {"order_id": db_order.order_id})
 
     db.commit()
     db.refresh(db_order)  # Refresh the order to get the order_items
+    for game in games:
+        publish_game("game.stock", game, fields=("stock_quantity",))
     return db_order
     
 
@@ -182,7 +229,136 @@ def get_order(db: Session, order_id: int) -> Optional[models.Order]:
     """
     Get an order by its ID.
     """
-    return db.query(models.Order).filter(models.Order.order_id == order_id).first()
+    return (
+        db.query(models.Order)
+        .options(selectinload(models.Order.order_items))
+        .filter(models.Order.order_id == order_id)
+        .first()
+    )
+
+
+#==============================================================================
+# Order status lifecycle
+#
+#   pending -> paid -> processing -> shipped -> delivered
+#   pending, paid and processing can be cancelled, which puts the stock back.
+#
+# Every transition is a conditional UPDATE on the current status, so two
+# requests (or workers) racing on one order can't both move it. Fulfilment
+# workers take paid orders with `claim_paid_orders`, which moves a batch to
+# processing; handing an order back (processing -> paid) releases the claim.
+#==============================================================================
+
+ORDER_STATUSES = ("pending", "paid", "processing", "shipped", "delivered", "cancelled")
+ORDER_TRANSITIONS = {
+    "pending": ("paid", "cancelled"),
+    "paid": ("processing", "cancelled"),
+    "processing": ("paid", "shipped", "cancelled"),
+    "shipped": ("delivered",),
+    "delivered": (),
+    "cancelled": (),
+}
+ORDER_CLAIM_BATCH = int(os.getenv("ORDER_CLAIM_BATCH", "10"))
+
+
+def normalize_order_status(value: str) -> str:
+    """'Paid' and 'paid' are the same status; anything outside ORDER_STATUSES is rejected."""
+    normalized = value.strip().lower()
+    if normalized not in ORDER_STATUSES:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown order status '{value}'")
+    return normalized
+
+
+def update_order_status(db: Session, order_id: int, new_status: str, commit: bool = True) -> Optional[models.Order]:
+    """
+    Move an order to `new_status` if the lifecycle allows it from its current status.
+    Setting the status it already has is a no-op, so job retries are safe.
+    Cancelling returns the ordered quantities to stock.
+    With commit=False the change is only flushed, for job handlers (the worker commits).
+    """
+    new_status = normalize_order_status(new_status)
+    db_order = get_order(db, order_id=order_id)
+    if not db_order:
+        return None
+    current = db_order.status.lower()
+    if current == new_status:
+        return db_order
+    if new_status not in ORDER_TRANSITIONS.get(current, ()):
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Order {order_id} can't go from {current} to {new_status}")
+
+    moved = db.execute(
+        update(models.Order)
+        .where(models.Order.order_id == order_id, models.Order.status == db_order.status)
+        .values(status=new_status)
+        .execution_options(synchronize_session=False)
+    )
+    if moved.rowcount != 1:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Order {order_id} changed status concurrently; retry")
+
+    restocked = []
+    if new_status == "cancelled":
+        for item in db_order.order_items:
+            db.execute(
+                update(models.Game)
+                .where(models.Game.game_id == item.game_id)
+                .values(stock_quantity=models.Game.stock_quantity + item.quantity)
+                .execution_options(synchronize_session=False)
+            )
+            restocked.append(item.game_id)
+    if not commit:
+        db.flush()
+        return db_order
+    db.commit()
+    db.refresh(db_order)
+    logger.info("Order %s moved from %s to %s", order_id, current, new_status)
+    for game in db.execute(select(models.Game).where(models.Game.game_id.in_(restocked))).scalars():
+        publish_game("game.stock", game, fields=("stock_quantity",))
+    return db_order
+
+
+def claim_paid_orders(db: Session, limit: int = ORDER_CLAIM_BATCH) -> List[models.Order]:
+    """
+    Claim up to `limit` of the oldest paid orders for fulfilment by moving them to processing.
+    Rows another worker has locked are skipped (FOR UPDATE SKIP LOCKED on PostgreSQL,
+    READPAST on SQL Server), and the status check in the UPDATE means an order is never
+    claimed twice even where the database has no row locks (SQLite).
+    """
+    candidates = db.execute(
+        select(models.Order.order_id)
+        .where(models.Order.status == "paid")
+        .order_by(models.Order.order_date, models.Order.order_id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+        .with_hint(models.Order, "WITH (UPDLOCK, ROWLOCK, READPAST)", "mssql")  # SQL Server ignores with_for_update
+    ).scalars().all()
+    if not candidates:
+        db.rollback()
+        return []
+    claim = (
+        update(models.Order)
+        .where(models.Order.order_id.in_(candidates), models.Order.status == "paid")
+        .values(status="processing")
+        .execution_options(synchronize_session=False)
+    )
+    if db.get_bind().dialect.update_returning:
+        # UPDATE ... RETURNING / OUTPUT inserted: the ids this worker actually won
+        claimed = db.execute(claim.returning(models.Order.order_id)).scalars().all()
+    else:
+        claimed = []
+        for order_id in candidates:
+            if db.execute(claim.where(models.Order.order_id == order_id)).rowcount == 1:
+                claimed.append(order_id)
+    db.commit()
+    if not claimed:
+        return []
+    return (
+        db.query(models.Order)
+        .options(selectinload(models.Order.order_items))
+        .filter(models.Order.order_id.in_(claimed))
+        .order_by(models.Order.order_date, models.Order.order_id)
+        .all()
+    )
 
 
 def get_orders_by_user(db: Session, user_id: int) -> List[models.Order]:
@@ -196,14 +372,19 @@ def get_orders_by_user(db: Session, user_id: int) -> List[models.Order]:
 def get_cart_item(db: Session, user_id: int, game_id: int):
     return db.query(models.CartItem).filter(
         models.CartItem.user_id == user_id,
-        models.CartItem.game_id == game_id
+        models.CartItem.game_id == game_id,
+        models.CartItem.created_at >= carts.cart_cutoff()
     ).first()
 
 def get_cart_item_by_id(db: Session, cart_item_id: int):
-    return db.query(models.CartItem).filter(models.CartItem.id == cart_item_id).first()
+    # The game is returned with the item, including after the item is deleted
+    return db.query(models.CartItem).options(joinedload(models.CartItem.game)).filter(models.CartItem.id == cart_item_id).first()
 
 def get_user_cart(db: Session, user_id: int):
-    return db.query(models.CartItem).filter(models.CartItem.user_id == user_id).all()
+    return db.query(models.CartItem).filter(
+        models.CartItem.user_id == user_id,
+        models.CartItem.created_at >= carts.cart_cutoff()
+    ).all()
 
 def create_cart_item(db: Session, cart_item: schemas.CartItemCreate, user_id: int):
     db_cart_item = models.CartItem(
@@ -220,6 +401,7 @@ def update_cart_item(db: Session, cart_item_id: int, quantity: int):
     db_cart_item = get_cart_item_by_id(db, cart_item_id)
     if db_cart_item:
         db_cart_item.quantity = quantity
+        db_cart_item.created_at = datetime.utcnow()  # restarts the hold and the expiry
         db.commit()
         db.refresh(db_cart_item)
     return db_cart_item
@@ -245,6 +427,85 @@ def create_payment(db: Session, payment: schemas.PaymentCreate, order=None) -> m
         transaction_id=transaction_id,
     )
     db.add(db_payment)
-    db.commit()
+    try:
+        db.flush()  # Need to flush to get the payment_id
+        # Order status and analytics are updated by the job queue once the payment commits
+        jobs.enqueue(db, "payment.succeeded", {"order_id": payment.order_id, "payment_id": db_payment.payment_id})
+        db.commit()
+    except IntegrityError:
+        # A concurrent request paid the order first (one payment per order)
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Order has already been paid")
     db.refresh(db_payment)
-    return db_payment
\ No newline at end of file
+    return db_payment
+
+
+#==============================================================================
+# Column-only reads for the fast list responses (see backend/fastjson.py)
+#==============================================================================
+
+GAME_COLUMNS = ("game_id", "title", "description", "price", "sale_price", "genre", "platform",
+                "release_date", "stock_quantity", "image_url", "created_at", "updated_at")
+ORDER_COLUMNS = ("order_id", "user_id", "order_date", "total_price", "status")
+ORDER_ITEM_COLUMNS = ("order_id", "order_item_id", "game_id", "quantity", "price", "price_at_purchase")
+CART_ITEM_COLUMNS = ("id", "user_id", "game_id", "quantity", "created_at")
+
+
+def get_game_rows(db: Session, skip: int = 0, limit: int = 100, columns=GAME_COLUMNS, with_held: bool = False):
+    """Game rows as tuples of `columns`; `with_held` appends the quantity held in carts (None when nothing is)."""
+    selected = [getattr(models.Game, column) for column in columns]
+    statement = select(*selected)
+    if with_held:
+        held = reservations.held_by_game()
+        statement = select(*selected, held.c.held).outerjoin(held, held.c.game_id == models.Game.game_id)
+    statement = statement.order_by(models.Game.game_id).offset(skip).limit(limit)
+    return db.execute(statement).all()
+
+
+def get_cart_rows(db: Session, user_id: int) -> List[dict]:
+    """
+    Cart items with their game nested under "game", from a single joined select.
+    """
+    statement = (
+        select(
+            *[getattr(models.CartItem, column) for column in CART_ITEM_COLUMNS],
+            *[getattr(models.Game, column) for column in GAME_COLUMNS],
+        )
+        .join(models.Game, models.Game.game_id == models.CartItem.game_id)
+        .where(models.CartItem.user_id == user_id, models.CartItem.created_at >= carts.cart_cutoff())
+        .order_by(models.CartItem.id)
+    )
+    split = len(CART_ITEM_COLUMNS)
+    items = []
+    for row in db.execute(statement):
+        item = dict(zip(CART_ITEM_COLUMNS, row[:split]))
+        item["game"] = dict(zip(GAME_COLUMNS, row[split:]))
+        items.append(item)
+    return items
+
+
+def get_order_rows_by_user(db: Session, user_id: int) -> List[dict]:
+    """
+    A user's orders with their items, using one query for orders and one for all their items.
+    """
+    orders = [
+        dict(zip(ORDER_COLUMNS, row), order_items=[])
+        for row in db.execute(
+            select(*[getattr(models.Order, column) for column in ORDER_COLUMNS])
+            .where(models.Order.user_id == user_id)
+            .order_by(models.Order.order_id)
+        )
+    ]
+    if not orders:
+        return orders
+    by_id = {order["order_id"]: order for order in orders}
+    item_rows = db.execute(
+        select(*[getattr(models.OrderItem, column) for column in ORDER_ITEM_COLUMNS])
+        .join(models.Order, models.Order.order_id == models.OrderItem.order_id)
+        .where(models.Order.user_id == user_id)
+        .order_by(models.OrderItem.order_item_id)
+    )
+    for row in item_rows:
+        item = dict(zip(ORDER_ITEM_COLUMNS, row))
+        by_id[item.pop("order_id")]["order_items"].append(item)
+    return orders
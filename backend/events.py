@@ -0,0 +1,167 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Set
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from backend import fastjson, models
+from backend.database import DB_DISABLED, SessionLocal
+
+logger = logging.getLogger(__name__)
+
+#==============================================================================
+# Catalog change feed
+#
+# CRUD functions publish small deltas (price, stock, created/deleted games)
+# after they commit. Each event is encoded once and handed to the event loop,
+# which copies the same string into every subscriber's queue. WebSocket and
+# SSE endpoints in main.py drain those queues.
+#
+# Every event is also written to the CatalogEvents table. Once a process has
+# subscribers it polls that table every FEED_POLL_INTERVAL seconds and fans
+# out the events other processes published, so a client sees every write
+# whichever worker made it (including pricing.apply in a standalone job
+# worker). Rows older than FEED_RETENTION seconds are deleted by the
+# recurring events.purge job.
+#==============================================================================
+
+FEED_QUEUE_SIZE = int(os.getenv("FEED_QUEUE_SIZE", "100"))
+FEED_POLL_INTERVAL = float(os.getenv("FEED_POLL_INTERVAL", "1"))
+FEED_RETENTION = int(os.getenv("FEED_RETENTION", "300"))
+FEED_PURGE_INTERVAL = int(os.getenv("FEED_PURGE_INTERVAL", "300"))
+
+# Commits can land out of event_id order, so each poll looks back this far
+# (by created_at) and skips the events it has already delivered.
+FEED_POLL_LOOKBACK = timedelta(seconds=5)
+
+
+class CatalogFeed:
+    def __init__(self, queue_size: int = FEED_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.origin = uuid.uuid4().hex  # tells this process's rows apart from the others'
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._poller: Optional[threading.Thread] = None
+        self._poller_lock = threading.Lock()
+
+    def subscribe(self) -> asyncio.Queue:
+        """Register a subscriber. Must be called from the event loop."""
+        self._loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(queue)
+        self._start_poller()
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def publish(self, event: dict):
+        """
+        Broadcast an event to this process's subscribers and record it for the
+        other processes. Safe to call from request threads.
+        """
+        message = fastjson.dumps(event).decode()
+        self._deliver(message)
+        if not DB_DISABLED:
+            self._record(message)
+
+    def _record(self, message: str):
+        db = SessionLocal()
+        try:
+            db.add(models.CatalogEvent(origin=self.origin, body=message))
+            db.commit()
+        except Exception:
+            # The local subscribers already have it; only the relay is lost
+            logger.exception("Could not record catalog event")
+        finally:
+            db.close()
+
+    def _deliver(self, message: str):
+        loop = self._loop
+        if loop is None or not self._subscribers or loop.is_closed():
+            return
+        loop.call_soon_threadsafe(self._fan_out, message)
+
+    def _fan_out(self, message: str):
+        for queue in list(self._subscribers):
+            if queue.full():
+                # Slow client: drop its oldest event rather than block everyone else
+                queue.get_nowait()
+            queue.put_nowait(message)
+
+    #--------------------------------------------------------------------------
+    # Relay from the other processes
+    #--------------------------------------------------------------------------
+
+    def _start_poller(self):
+        if self._poller is not None or DB_DISABLED:
+            return
+        with self._poller_lock:
+            if self._poller is None:
+                self._poller = threading.Thread(target=self._poll_forever, name="catalog-feed-relay", daemon=True)
+                self._poller.start()
+
+    def _poll_forever(self):
+        seen: Dict[int, datetime] = {}  # event_id -> created_at, for the lookback window
+        floor = since = datetime.utcnow()  # only relay events published while someone is subscribed
+        while True:
+            time.sleep(FEED_POLL_INTERVAL)
+            if not self._subscribers:
+                floor = since = datetime.utcnow()
+                seen.clear()
+                continue
+            db = SessionLocal()
+            try:
+                since = self._poll(db, max(floor, since - FEED_POLL_LOOKBACK), seen)
+            except Exception:
+                logger.exception("Catalog feed relay poll failed")
+            finally:
+                db.close()
+
+    def _poll(self, db: Session, since: datetime, seen: Dict[int, datetime]) -> datetime:
+        """Deliver the other processes' events created since `since`; returns the time of this poll."""
+        polled_at = datetime.utcnow()
+        rows = db.execute(
+            select(models.CatalogEvent.event_id, models.CatalogEvent.origin, models.CatalogEvent.body, models.CatalogEvent.created_at)
+            .where(models.CatalogEvent.created_at >= since)
+            .order_by(models.CatalogEvent.event_id)
+        ).all()
+        for event_id, origin, body, created_at in rows:
+            if event_id in seen:
+                continue
+            seen[event_id] = created_at
+            if origin == self.origin:
+                continue
+            self._deliver(body)
+        cutoff = polled_at - 2 * FEED_POLL_LOOKBACK
+        for event_id in [event_id for event_id, created_at in seen.items() if created_at < cutoff]:
+            del seen[event_id]
+        return polled_at
+
+
+catalog_feed = CatalogFeed()
+
+
+def publish_game(event_type: str, game, fields=None):
+    """Publish a game delta. `fields` limits the payload to the changed columns."""
+    fields = fields or ("title", "price", "genre", "platform", "stock_quantity", "image_url")
+    payload = {field: getattr(game, field) for field in fields}
+    catalog_feed.publish({"type": event_type, "game_id": game.game_id, **payload})
+
+
+def purge_events(db: Session) -> int:
+    """Delete relayed events past FEED_RETENTION. Runs as the recurring events.purge job."""
+    cutoff = datetime.utcnow() - timedelta(seconds=FEED_RETENTION)
+    result = db.execute(delete(models.CatalogEvent).where(models.CatalogEvent.created_at < cutoff))
+    db.commit()
+    return result.rowcount
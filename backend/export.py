@@ -0,0 +1,125 @@
+import csv
+import io
+import os
+from datetime import datetime
+from typing import Iterator, Optional
+
+from sqlalchemy import select
+
+from backend import fastjson, models
+from .database import SessionLocal
+
+#==============================================================================
+# Streaming exports of Orders, OrderItems and Payments for reporting
+#==============================================================================
+
+# Rows fetched from the cursor per round trip. Only one chunk is held in
+# memory at a time, so a month of orders streams in constant memory.
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "1000"))
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "jsonl": "application/x-ndjson",
+    "columnar": "application/x-ndjson",  # one column-oriented chunk per line
+}
+
+
+def _orders_statement(start: datetime, end: datetime):
+    return (
+        select(
+            models.Order.order_id,
+            models.Order.user_id,
+            models.Order.order_date,
+            models.Order.total_price,
+            models.Order.status,
+        )
+        .where(models.Order.order_date >= start, models.Order.order_date < end)
+        .order_by(models.Order.order_id)
+    )
+
+
+def _order_items_statement(start: datetime, end: datetime):
+    return (
+        select(
+            models.OrderItem.order_item_id,
+            models.OrderItem.order_id,
+            models.OrderItem.game_id,
+            models.OrderItem.quantity,
+            models.OrderItem.price_at_purchase,
+            models.Order.order_date,
+        )
+        .join(models.Order, models.Order.order_id == models.OrderItem.order_id)
+        .where(models.Order.order_date >= start, models.Order.order_date < end)
+        .order_by(models.OrderItem.order_item_id)
+    )
+
+
+def _payments_statement(start: datetime, end: datetime):
+    return (
+        select(
+            models.Payment.payment_id,
+            models.Payment.order_id,
+            models.Payment.payment_date,
+            models.Payment.payment_method,
+            models.Payment.amount_paid,
+            models.Payment.transaction_id,
+            models.Payment.payment_status,
+        )
+        .where(models.Payment.payment_date >= start, models.Payment.payment_date < end)
+        .order_by(models.Payment.payment_id)
+    )
+
+
+EXPORT_TABLES = {
+    "orders": _orders_statement,
+    "order_items": _order_items_statement,
+    "payments": _payments_statement,
+}
+
+
+def _iter_chunks(table: str, start: datetime, end: datetime, chunk_size: int):
+    """
+    Yield (columns, rows) chunks using yield_per, so the driver streams the
+    result set instead of buffering it. The export owns its session because
+    the response body is produced after the request dependencies are closed.
+    """
+    statement = EXPORT_TABLES[table](start, end)
+    db = SessionLocal()
+    try:
+        result = db.execute(statement, execution_options={"yield_per": chunk_size})
+        columns = list(result.keys())
+        for rows in result.partitions():
+            yield columns, rows
+    finally:
+        db.close()
+
+
+def stream_export(table: str, start: datetime, end: datetime, fmt: str = "csv",
+                  chunk_size: Optional[int] = None) -> Iterator[str]:
+    """
+    Stream a table export over [start, end) as CSV, JSON lines, or
+    column-oriented JSON chunks (one {"columns", "data"} object per chunk).
+    """
+    chunk_size = chunk_size or EXPORT_CHUNK_SIZE
+    header_sent = False
+    for columns, rows in _iter_chunks(table, start, end, chunk_size):
+        if fmt == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            if not header_sent:
+                writer.writerow(columns)
+                header_sent = True
+            writer.writerows(rows)
+            yield buffer.getvalue()
+        elif fmt == "jsonl":
+            yield "".join(
+                fastjson.dumps(dict(zip(columns, row))).decode() + "\n"
+                for row in rows
+            )
+        else:
+            data = {column: [row[i] for row in rows] for i, column in enumerate(columns)}
+            yield fastjson.dumps({"columns": columns, "rows": len(rows), "data": data}).decode() + "\n"
+
+    # Keep CSV output well-formed for empty ranges
+    if fmt == "csv" and not header_sent:
+        yield ",".join(EXPORT_TABLES[table](start, end).selected_columns.keys()) + "\r\n"
@@ -0,0 +1,73 @@
+from datetime import date, datetime
+from decimal import Decimal
+from functools import lru_cache
+from typing import Iterable, List, Sequence
+
+import orjson
+from fastapi import Request
+from fastapi.responses import Response
+
+#==============================================================================
+# Fast response path for list endpoints
+#
+# List endpoints select only the columns they return and get plain row
+# tuples back. Those rows are zipped into dicts and encoded by orjson, which
+# handles datetime/date natively; Decimal is written as a float, matching
+# the json_encoders on the Pydantic schemas. This skips per-row Pydantic
+# validation of ORM objects entirely.
+#==============================================================================
+
+def _default(value):
+    """Shared by the JSON and MessagePack encoders (orjson handles datetime itself, msgpack doesn't)."""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not serializable")
+
+
+def dumps(content) -> bytes:
+    return orjson.dumps(content, default=_default)
+
+
+def rows_to_dicts(columns: Sequence[str], rows: Iterable[tuple]) -> List[dict]:
+    return [dict(zip(columns, row)) for row in rows]
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+#==============================================================================
+# MessagePack output, selected with "Accept: application/msgpack"
+#==============================================================================
+
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack")
+
+
+@lru_cache(maxsize=None)
+def _msgpack():
+    """The msgpack module, or None when it is not installed. Imported on first use, not at startup."""
+    try:  # Optional: pip install msgpack
+        import msgpack
+    except ImportError:
+        return None
+    return msgpack
+
+
+class MsgPackResponse(Response):
+    media_type = "application/msgpack"
+
+    def render(self, content) -> bytes:
+        return _msgpack().packb(content, default=_default)
+
+
+def render(request: Request, content) -> Response:
+    """Encode `content` as MessagePack when the client asks for it, otherwise JSON."""
+    accept = request.headers.get("accept", "")
+    if any(media_type in accept for media_type in MSGPACK_TYPES) and _msgpack() is not None:
+        return MsgPackResponse(content, headers={"Vary": "Accept"})
+    return FastJSONResponse(content, headers={"Vary": "Accept"})
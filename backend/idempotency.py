@@ -0,0 +1,155 @@
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+from fastapi import HTTPException, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from backend import models
+from .database import SessionLocal
+
+#==============================================================================
+# Idempotency-Key support for checkout and payment
+#
+# Each (scope, key) is a row in IdempotencyKeys holding a request fingerprint
+# and the response that was sent the first time. Retries with the same key
+# get the stored response back, whichever worker process they reach. The
+# unique constraint on (scope, key) decides which of several racing requests
+# runs; the others get 409 until it finishes.
+#
+# Rows are written in their own short transactions, so a reservation is
+# visible to other workers at once. Entries expire after IDEMPOTENCY_TTL
+# seconds. A reservation whose request never finished (the worker died) is
+# taken over after IDEMPOTENCY_LOCK_TIMEOUT seconds.
+#==============================================================================
+
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", "86400"))
+IDEMPOTENCY_LOCK_TIMEOUT = int(os.getenv("IDEMPOTENCY_LOCK_TIMEOUT", "120"))
+IDEMPOTENCY_PURGE_INTERVAL = int(os.getenv("IDEMPOTENCY_PURGE_INTERVAL", "3600"))
+
+
+def fingerprint(*parts: str) -> str:
+    """Compact digest of the request parts that must match on a retry."""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(part.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class IdempotencyStore:
+    def __init__(self, ttl: int = IDEMPOTENCY_TTL, lock_timeout: int = IDEMPOTENCY_LOCK_TIMEOUT):
+        self.ttl = ttl
+        self.lock_timeout = lock_timeout
+
+    def _reserve(self, db: Session, scope: str, key: str, request_fingerprint: str, now: datetime) -> bool:
+        db.add(models.IdempotencyKey(
+            scope=scope, key=key, fingerprint=request_fingerprint,
+            created_at=now, expires_at=now + timedelta(seconds=self.ttl),
+        ))
+        try:
+            db.commit()
+            return True
+        except IntegrityError:
+            db.rollback()
+            return False
+
+    def lookup(self, scope: str, key: Optional[str], request_fingerprint: str) -> Optional[JSONResponse]:
+        """
+        Return the stored response for a retried request, or reserve the key
+        and return None so the caller runs the request.
+        """
+        if not key:
+            return None
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            if self._reserve(db, scope, key, request_fingerprint, now):
+                return None
+            entry = db.execute(
+                select(models.IdempotencyKey).where(models.IdempotencyKey.scope == scope, models.IdempotencyKey.key == key)
+            ).scalar_one_or_none()
+            if entry is None or entry.expires_at <= now:
+                # Expired (or released meanwhile): clear it and try once more
+                db.execute(delete(models.IdempotencyKey).where(
+                    models.IdempotencyKey.scope == scope, models.IdempotencyKey.key == key, models.IdempotencyKey.expires_at <= now,
+                ))
+                db.commit()
+                if self._reserve(db, scope, key, request_fingerprint, now):
+                    return None
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="A request with this Idempotency-Key is still being processed",
+                )
+            if entry.fingerprint != request_fingerprint:
+                raise HTTPException(
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    detail="Idempotency-Key was already used with a different request",
+                )
+            if entry.status_code is None:
+                # Take over a reservation abandoned by a worker that died mid-request
+                taken = db.execute(
+                    update(models.IdempotencyKey)
+                    .where(
+                        models.IdempotencyKey.id == entry.id,
+                        models.IdempotencyKey.status_code.is_(None),
+                        models.IdempotencyKey.created_at <= now - timedelta(seconds=self.lock_timeout),
+                    )
+                    .values(created_at=now)
+                )
+                db.commit()
+                if taken.rowcount == 1:
+                    return None
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="A request with this Idempotency-Key is still being processed",
+                )
+            return JSONResponse(status_code=entry.status_code, content=json.loads(entry.body), headers={"Idempotent-Replayed": "true"})
+        finally:
+            db.close()
+
+    def save(self, scope: str, key: Optional[str], status_code: int, body) -> JSONResponse:
+        """Store the response for a completed request and return it."""
+        content = jsonable_encoder(body)
+        if key:
+            db = SessionLocal()
+            try:
+                db.execute(
+                    update(models.IdempotencyKey)
+                    .where(models.IdempotencyKey.scope == scope, models.IdempotencyKey.key == key)
+                    .values(status_code=status_code, body=json.dumps(content))
+                )
+                db.commit()
+            finally:
+                db.close()
+        return JSONResponse(status_code=status_code, content=content)
+
+    def release(self, scope: str, key: Optional[str]):
+        """Forget a reservation after a failed request so the client can retry it."""
+        if key:
+            db = SessionLocal()
+            try:
+                db.execute(delete(models.IdempotencyKey).where(
+                    models.IdempotencyKey.scope == scope,
+                    models.IdempotencyKey.key == key,
+                    models.IdempotencyKey.status_code.is_(None),
+                ))
+                db.commit()
+            finally:
+                db.close()
+
+
+def purge_expired(db: Session) -> int:
+    """Delete expired keys. Runs as the recurring idempotency.purge job."""
+    result = db.execute(delete(models.IdempotencyKey).where(models.IdempotencyKey.expires_at <= datetime.utcnow()))
+    db.commit()
+    return result.rowcount
+
+
+store = IdempotencyStore()
@@ -0,0 +1,259 @@
+import json
+import logging
+import os
+import threading
+import traceback
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import event, func, select, update
+from sqlalchemy.orm import Session
+
+from backend import models
+from .database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+#==============================================================================
+# Background job queue
+#
+# Jobs are rows in the Jobs table, so they survive restarts and can be
+# drained by the in-app worker threads or by a separate process
+# (`python -m backend.manage worker`). `enqueue` only adds the row to the caller's
+# session, so a job becomes visible exactly when the order or payment that
+# created it commits.
+#==============================================================================
+
+JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", "2"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+JOB_TIMEOUT = int(os.getenv("JOB_TIMEOUT", "300"))  # seconds before a running job is considered abandoned
+
+HANDLERS: Dict[str, Callable[[Session, dict], None]] = {}
+
+# Set after a commit that enqueued work, so idle workers pick it up at once
+_wakeup = threading.Event()
+
+
+def job(kind: str):
+    """Register a handler for a job kind. Handlers receive (db, payload)."""
+    def decorator(func: Callable[[Session, dict], None]):
+        HANDLERS[kind] = func
+        return func
+    return decorator
+
+
+def _wake(session):
+    _wakeup.set()
+
+
+def enqueue(db: Session, kind: str, payload: dict, delay: int = 0,
+            max_attempts: Optional[int] = None) -> models.Job:
+    """
+    Add a job to the caller's session. The caller commits.
+    """
+    db_job = models.Job(
+        kind=kind,
+        payload=json.dumps(payload),
+        status="queued",
+        attempts=0,
+        max_attempts=max_attempts or JOB_MAX_ATTEMPTS,
+        run_after=datetime.utcnow() + timedelta(seconds=delay),
+    )
+    db.add(db_job)
+    event.listen(db, "after_commit", _wake, once=True)
+    return db_job
+
+
+def ensure_scheduled(db: Session, kind: str, payload: dict, delay: int = 0) -> bool:
+    """
+    Enqueue a recurring job unless one of that kind is already queued.
+    Handlers of recurring jobs call this for their own next run, so however
+    many processes seed the job at startup, the chains collapse into one.
+    """
+    pending = db.execute(
+        select(models.Job.job_id)
+        .where(models.Job.kind == kind, models.Job.status == "queued")
+        .limit(1)
+    ).first()
+    if pending:
+        return False
+    enqueue(db, kind, payload, delay=delay)
+    db.commit()
+    return True
+
+
+#==============================================================================
+# Claiming and running jobs
+#==============================================================================
+
+def _claim_next(db: Session) -> Optional[models.Job]:
+    """
+    Claim the oldest runnable job. The conditional UPDATE only succeeds for
+    one worker, so several threads or processes can poll the same table.
+    """
+    now = datetime.utcnow()
+    candidates = db.execute(
+        select(models.Job.job_id)
+        .where(models.Job.status == "queued", models.Job.run_after <= now)
+        .order_by(models.Job.job_id)
+        .limit(JOB_CONCURRENCY + 1)
+    ).scalars().all()
+    for job_id in candidates:
+        claimed = db.execute(
+            update(models.Job)
+            .where(models.Job.job_id == job_id, models.Job.status == "queued")
+            .values(status="running", attempts=models.Job.attempts + 1, started_at=now)
+        )
+        db.commit()
+        if claimed.rowcount == 1:
+            return db.get(models.Job, job_id)
+    return None
+
+
+def run_job(db: Session, db_job: models.Job):
+    """
+    Run one claimed job. Failures are retried with exponential backoff until
+    max_attempts, after which the job is parked in the dead-letter list.
+    """
+    handler = HANDLERS.get(db_job.kind)
+    try:
+        if handler is None:
+            raise LookupError(f"No handler registered for job kind '{db_job.kind}'")
+        handler(db, json.loads(db_job.payload))
+        db_job.status = "done"
+        db_job.last_error = None
+    except Exception as e:
+        db.rollback()
+        logger.warning("Job %s (%s) failed on attempt %s: %s", db_job.job_id, db_job.kind, db_job.attempts, e)
+        db_job.last_error = traceback.format_exc(limit=5)
+        if db_job.attempts >= db_job.max_attempts or handler is None:
+            db_job.status = "dead"
+        else:
+            db_job.status = "queued"
+            db_job.run_after = datetime.utcnow() + timedelta(seconds=2 ** db_job.attempts)
+    db_job.finished_at = datetime.utcnow()
+    db.commit()
+
+
+def run_pending(limit: int = 100) -> int:
+    """Drain up to `limit` runnable jobs in the calling thread. Returns the number run."""
+    count = 0
+    db = SessionLocal()
+    try:
+        while count < limit:
+            db_job = _claim_next(db)
+            if db_job is None:
+                break
+            run_job(db, db_job)
+            count += 1
+    finally:
+        db.close()
+    return count
+
+
+def requeue_stale(db: Session) -> int:
+    """Return jobs left 'running' by a crashed worker to the queue."""
+    cutoff = datetime.utcnow() - timedelta(seconds=JOB_TIMEOUT)
+    result = db.execute(
+        update(models.Job)
+        .where(models.Job.status == "running", models.Job.started_at < cutoff)
+        .values(status="queued")
+    )
+    db.commit()
+    return result.rowcount
+
+
+class JobWorker:
+    """
+    A pool of `concurrency` threads polling the Jobs table. The thread count
+    is the concurrency limit for job execution in this process.
+    """
+
+    def __init__(self, concurrency: int = JOB_CONCURRENCY, poll_interval: float = JOB_POLL_INTERVAL):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self._stopping = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self):
+        self._stopping.clear()
+        db = SessionLocal()
+        try:
+            requeue_stale(db)
+        finally:
+            db.close()
+        for i in range(self.concurrency):
+            thread = threading.Thread(target=self._loop, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info("Started %s job worker thread(s)", self.concurrency)
+
+    def stop(self, timeout: float = 10.0):
+        self._stopping.set()
+        _wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _loop(self):
+        while not self._stopping.is_set():
+            try:
+                ran = run_pending(limit=1)
+            except Exception:
+                logger.exception("Job worker error")
+                ran = 0
+            if not ran:
+                _wakeup.wait(self.poll_interval)
+                _wakeup.clear()
+
+
+#==============================================================================
+# Monitoring
+#==============================================================================
+
+def queue_stats(db: Session, sample: int = 100) -> dict:
+    """
+    Queue depth per status, age of the oldest runnable job, and mean wait /
+    run time over the most recently finished jobs.
+    """
+    counts = dict(db.execute(select(models.Job.status, func.count()).group_by(models.Job.status)).all())
+    oldest = db.execute(select(func.min(models.Job.created_at)).where(models.Job.status == "queued")).scalar()
+    recent = db.execute(
+        select(models.Job.created_at, models.Job.started_at, models.Job.finished_at)
+        .where(models.Job.status == "done")
+        .order_by(models.Job.finished_at.desc())
+        .limit(sample)
+    ).all()
+
+    now = datetime.utcnow()
+    waits = [(row.started_at - row.created_at).total_seconds() for row in recent if row.started_at]
+    runs = [(row.finished_at - row.started_at).total_seconds() for row in recent if row.started_at and row.finished_at]
+    return {
+        "queued": counts.get("queued", 0),
+        "running": counts.get("running", 0),
+        "done": counts.get("done", 0),
+        "dead": counts.get("dead", 0),
+        "oldest_queued_seconds": (now - oldest).total_seconds() if oldest else 0.0,
+        "avg_wait_seconds": sum(waits) / len(waits) if waits else 0.0,
+        "avg_run_seconds": sum(runs) / len(runs) if runs else 0.0,
+    }
+
+
+def get_dead_jobs(db: Session, skip: int = 0, limit: int = 100) -> List[models.Job]:
+    return db.query(models.Job).filter(models.Job.status == "dead").order_by(models.Job.job_id).offset(skip).limit(limit).all()
+
+
+def retry_job(db: Session, job_id: int) -> Optional[models.Job]:
+    """Move a dead job back to the queue with a fresh attempt budget."""
+    db_job = db.get(models.Job, job_id)
+    if not db_job or db_job.status != "dead":
+        return None
+    db_job.status = "queued"
+    db_job.attempts = 0
+    db_job.run_after = datetime.utcnow()
+    event.listen(db, "after_commit", _wake, once=True)
+    db.commit()
+    db.refresh(db_job)
+    return db_job
+
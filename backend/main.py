@@ -1,69 +1,75 @@
-from fastapi import FastAPI, Depends, HTTPException, status, Request
+from fastapi import FastAPI, Depends, HTTPException, status, Request, Header, WebSocket, WebSocketDisconnect
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm import Session
 from typing import List
 from fastapi.middleware.cors import CORSMiddleware
 from decimal import Decimal
 from fastapi import File, UploadFile
-from backend import crud, models, schemas, security
-from .database import SessionLocal, Base, engine
+from backend import crud, models, schemas, security, export, analytics, jobs, tasks, idempotency, ratelimit, fastjson, carts, reservations, manage, querybudget, recommendations, pricing
+from backend.compression import CompressionMiddleware
+from backend.events import catalog_feed
+import asyncio
+from contextlib import asynccontextmanager
+from . import database
+from .database import SessionLocal
 import os
-from datetime import timedelta
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-from sqlalchemy import text
+from fastapi.responses import FileResponse, StreamingResponse
 
-# Initialize database tables
-Base.metadata.create_all(bind=engine)
+# Schema creation is a separate step (`python -m backend.manage migrate`) so
+# workers don't each run it at boot. DB_AUTO_MIGRATE=1 runs it on startup
+# instead, for single-process development.
+DB_AUTO_MIGRATE = os.getenv("DB_AUTO_MIGRATE", "0") == "1"
 
-app = FastAPI(
-    title="GameStore API",
-    version="0.1.0",
-    description="API for managing an online game store."
-)
+# Image upload directory
+UPLOAD_DIR = manage.UPLOAD_DIR
+
+# Background job workers for post-checkout work (set JOB_CONCURRENCY=0 to run
+# them only in a separate `python -m backend.manage worker` process)
+job_worker = jobs.JobWorker()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    if database.DB_DISABLED:
+        # No-DB boot: routes are served, but nothing at startup touches the database
+        yield
+        return
+    if DB_AUTO_MIGRATE:
+        manage.migrate()
+    db = SessionLocal()
+    try:
+        tasks.schedule_recurring(db)
+    finally:
+        db.close()
+    if job_worker.concurrency > 0:
+        job_worker.start()
+    recommendations.index.refresh_in_background()  # initial build; the API serves nothing until it lands
+    pricing.prices.reload_in_background()
+    yield
+    job_worker.stop()
 
-# API routes should come before static file serving
 api_app = FastAPI(title="GameStore API", version="0.1.0")
-app.mount("/api", api_app)
-
-# Image upload directory
-UPLOAD_DIR = "frontend/images"
-if not os.path.exists(UPLOAD_DIR):
-    os.makedirs(UPLOAD_DIR)
 
-# Serve static files for the frontend
-app.mount("/css", StaticFiles(directory="frontend/css"), name="css")
-app.mount("/js", StaticFiles(directory="frontend/js"), name="js")
-app.mount("/images", StaticFiles(directory="frontend/images"), name="images")
+# Shed load on the API with 503s when too many requests are in flight or the DB pool is exhausted
+api_app.add_middleware(ratelimit.LoadSheddingMiddleware)
 
 # Serve frontend HTML files
-@app.get("/")
 async def read_root():
     return FileResponse("frontend/index.html")
 
-@app.get("/{filename}.html")
 async def read_html(filename: str):
     return FileResponse(f"frontend/{filename}.html")
 
 # Catch-all route for other static files
-@app.get("/{path:path}")
 async def read_static(path: str):
     static_path = f"frontend/{path}"
     if os.path.exists(static_path):
         return FileResponse(static_path)
     raise HTTPException(status_code=404, detail="File not found")
 
-@api_app.post("/upload-image/", tags=["Images"])
-async def upload_image(file: UploadFile = File(...)):
-    """
-    Upload an image to the server.
-    """
-    file_location = os.path.join(UPLOAD_DIR, file.filename)
-    with open(file_location, "wb") as f:
-        f.write(await file.read())
-    return {"image_url": f"/images/{file.filename}"}
-
-
 # CORS middleware configuration
 origins = [
     "http://localhost:8000",  # Backend
@@ -73,13 +79,54 @@ origins = [
     "http://127.0.0.1:3000",  # Alternative frontend port
 ]
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=origins,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+def create_app() -> FastAPI:
+    """
+    Build the ASGI app. Nothing here touches the database; that happens in
+    `lifespan`, once per worker process.
+    Multi-worker: `python -m backend.manage serve --workers 4`
+    (or `uvicorn backend.main:create_app --factory --workers 4`).
+    """
+    app = FastAPI(
+        title="GameStore API",
+        version="0.1.0",
+        description="API for managing an online game store.",
+        lifespan=lifespan,
+    )
+
+    # API routes should come before static file serving
+    app.mount("/api", api_app)
+
+    # Serve static files for the frontend (the images dir is created in lifespan)
+    app.mount("/css", StaticFiles(directory="frontend/css"), name="css")
+    app.mount("/js", StaticFiles(directory="frontend/js"), name="js")
+    app.mount("/images", StaticFiles(directory=UPLOAD_DIR, check_dir=False), name="images")
+
+    app.add_api_route("/", read_root, methods=["GET"])
+    app.add_api_route("/{filename}.html", read_html, methods=["GET"])
+    app.add_api_route("/{path:path}", read_static, methods=["GET"])
+    app.add_api_route("/some-endpoint", some_endpoint, methods=["GET"], tags=["Example"])
+
+    # gzip/brotli for responses over COMPRESS_MIN_SIZE bytes (API and static files)
+    app.add_middleware(CompressionMiddleware)
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=origins,
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    return app
+
+@api_app.post("/upload-image/", tags=["Images"])
+async def upload_image(file: UploadFile = File(...)):
+    """
+    Upload an image to the server.
+    """
+    file_location = os.path.join(UPLOAD_DIR, file.filename)
+    with open(file_location, "wb") as f:
+        f.write(await file.read())
+    return {"image_url": f"/images/{file.filename}"}
 
 
 # Dependency: Get DB session
@@ -118,6 +165,25 @@ async def get_current_admin_user(current_user: models.User = Depends(get_current
     return current_user
 
 
+# Rate limits: logins are expensive (bcrypt), cart adds hit the DB several times
+login_rate_limit = ratelimit.RateLimit(
+    "login",
+    rate=float(os.getenv("LOGIN_RATE_PER_SECOND", "0.2")),
+    burst=int(os.getenv("LOGIN_RATE_BURST", "5")),
+)
+cart_rate_limit = ratelimit.RateLimit(
+    "cart",
+    rate=float(os.getenv("CART_RATE_PER_SECOND", "2")),
+    burst=int(os.getenv("CART_RATE_BURST", "10")),
+)
+
+def limit_login(request: Request, form_data: OAuth2PasswordRequestForm = Depends()):
+    login_rate_limit.check(request, identity=form_data.username.lower())
+
+def limit_cart(request: Request, current_user: models.User = Depends(get_current_user)):
+    cart_rate_limit.check(request, identity=current_user.user_id)
+
+
 # ======================================================================================
 #                                 API Endpoints for Games
 # ======================================================================================
@@ -134,15 +200,49 @@ def create_game_endpoint(
     # Ensure all required fields are handled, including stock_quantity, platform, and release_date
     return crud.create_game(db=db, game=game)
 
-@api_app.get("/games/", response_model=List[schemas.Game], tags=["Games"])
-def read_games_endpoint(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+# Listing fields computed in memory, and the columns each is computed from
+COMPUTED_GAME_FIELDS = {
+    "available_quantity": ("game_id", "stock_quantity"),
+    "effective_price": ("game_id", "price"),
+}
+
+@api_app.get("/games/", response_model=List[schemas.GameListing], tags=["Games"], dependencies=[Depends(querybudget.budget(1))])
+def read_games_endpoint(request: Request, skip: int = 0, limit: int = 100, fields: Optional[str] = None, db: Session = Depends(get_db)):
     """
     Retrieve a list of games with optional pagination.
-    """
-    return crud.get_games(db, skip=skip, limit=limit)
-
-
-@api_app.get("/games/{game_id}", response_model=schemas.Game, tags=["Games"])
+    `fields` selects a subset of columns, e.g. ?fields=game_id,title,price
+    Each game also gets available_quantity (stock not held in carts) and effective_price
+    (from the in-memory price table) unless `fields` leaves them out.
+    """
+    columns = crud.GAME_COLUMNS
+    computed = tuple(COMPUTED_GAME_FIELDS)
+    if fields:
+        columns = tuple(field.strip() for field in fields.split(",") if field.strip())
+        unknown = [column for column in columns if column not in crud.GAME_COLUMNS + computed]
+        if unknown or not columns:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown fields: {', '.join(unknown)}")
+        computed = tuple(column for column in columns if column in COMPUTED_GAME_FIELDS)
+        columns = tuple(column for column in columns if column not in COMPUTED_GAME_FIELDS)
+    # Computed fields need their source columns, so select them even if not requested
+    extra = tuple(dict.fromkeys(
+        column for field in computed for column in COMPUTED_GAME_FIELDS[field] if column not in columns
+    ))
+    with_held = "available_quantity" in computed
+    rows = crud.get_game_rows(db, skip=skip, limit=limit, columns=columns + extra, with_held=with_held)
+    games = fastjson.rows_to_dicts(columns + extra + (("held",) if with_held else ()), rows)
+    if with_held:
+        reservations.annotate_available(games)
+    if "effective_price" in computed:
+        pricing.prices.maybe_reload()
+        pricing.prices.annotate(games)
+    if extra:
+        for game in games:
+            for column in extra:
+                del game[column]
+    return fastjson.render(request, games)
+
+
+@api_app.get("/games/{game_id}", response_model=schemas.Game, tags=["Games"], dependencies=[Depends(querybudget.budget(1))])
 def read_game_endpoint(game_id: int, db: Session = Depends(get_db)):
     """
     Retrieve a specific game by its ID.
@@ -152,6 +252,16 @@ def read_game_endpoint(game_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Game not found")
     return db_game
 
+@api_app.get("/games/{game_id}/related", response_model=List[schemas.RelatedGame], tags=["Games"])
+async def read_related_games(request: Request, game_id: int, limit: int = 5):
+    """
+    "Customers also bought": games most often ordered together with this one.
+    Served from the in-memory co-purchase index, which refreshes itself in the background.
+    """
+    recommendations.index.maybe_refresh()
+    related = recommendations.index.related(game_id, limit)
+    return fastjson.render(request, [{"game_id": other, "score": score} for other, score in related])
+
 @api_app.put("/games/{game_id}", response_model=schemas.Game, tags=["Games"])
 def update_game_endpoint(game_id: int, game: schemas.GameUpdate, db: Session = Depends(get_db)):
     """
@@ -174,6 +284,50 @@ def delete_game_endpoint(game_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Game not found")
     return db_game
 
+@api_app.websocket("/ws/catalog")
+async def catalog_websocket(websocket: WebSocket):
+    """
+    Push catalog deltas (game.created, game.updated, game.stock, game.deleted) to the client.
+    """
+    await websocket.accept()
+    queue = catalog_feed.subscribe()
+
+    async def forward_events():
+        while True:
+            await websocket.send_text(await queue.get())
+
+    sender = asyncio.create_task(forward_events())
+    try:
+        # Clients only listen; reading here notices a disconnect right away
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+        catalog_feed.unsubscribe(queue)
+
+@api_app.get("/catalog/stream", tags=["Games"])
+async def catalog_event_stream(request: Request):
+    """
+    Server-Sent Events variant of the catalog change feed.
+    """
+    queue = catalog_feed.subscribe()
+
+    async def event_source():
+        try:
+            while not await request.is_disconnected():
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"data: {message}\n\n"
+        finally:
+            catalog_feed.unsubscribe(queue)
+
+    return StreamingResponse(event_source(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
 @api_app.post("/sample-games", tags=["Games"])
 async def create_sample_games(db: Session = Depends(get_db)):
     sample_games = [
@@ -238,7 +392,7 @@ def create_order(order: schemas.OrderCreate, db: Session = Depends(get_db), curr
     db_order = crud.create_order(db=db, order=order)
     return db_order
 
-@api_app.get("/orders/{order_id}", response_model=schemas.Order, tags=["Orders"])
+@api_app.get("/orders/{order_id}", response_model=schemas.Order, tags=["Orders"], dependencies=[Depends(querybudget.budget(3))])
 def get_order(order_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
     """
     Retrieve a specific order by its ID. Only the user who placed the order (or an admin) can access this.
@@ -253,13 +407,25 @@ def get_order(order_id: int, db: Session = Depends(get_db), current_user: models
         )
     return db_order
 
-@api_app.get("/orders/", response_model=List[schemas.Order], tags=["Orders"])
-def get_user_orders(db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+@api_app.get("/orders/", response_model=List[schemas.Order], tags=["Orders"], dependencies=[Depends(querybudget.budget(3))])
+def get_user_orders(request: Request, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
     """
     Retrieve all orders for the logged-in user.
     """
-    db_orders = crud.get_orders_by_user(db, user_id=current_user.user_id)
-    return db_orders
+    return fastjson.render(request, crud.get_order_rows_by_user(db, user_id=current_user.user_id))
+
+@api_app.post("/orders/{order_id}/cancel", response_model=schemas.Order, tags=["Orders"])
+def cancel_order(order_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+    """
+    Cancel one of your orders before it is paid. The items go back into stock.
+    """
+    db_order = crud.get_order(db, order_id=order_id)
+    if not db_order or db_order.user_id != current_user.user_id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Order not found")
+    paid = db.query(models.Payment.payment_id).filter(models.Payment.order_id == order_id).first() is not None
+    if db_order.status.lower() != "pending" or paid:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Only unpaid orders can be cancelled")
+    return crud.update_order_status(db, order_id=order_id, new_status="cancelled")
 
 # ======================================================================================
 #                                 API Endpoints for Authentication
@@ -289,7 +455,7 @@ def signup_new_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
             raise  # Re-raise other HTTPExceptions
     return db_user
     
-@api_app.post("/auth/token", response_model=schemas.Token, tags=["Authentication"])
+@api_app.post("/auth/token", response_model=schemas.Token, tags=["Authentication"], dependencies=[Depends(limit_login)])
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
     """
     OAuth2 compatible token login, get an access token for future requests.
@@ -312,7 +478,7 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
     return {"access_token": access_token, "token_type": "bearer", "role": user.role}
 
 
-@api_app.get("/users/me", response_model=schemas.User, tags=["Users"])
+@api_app.get("/users/me", response_model=schemas.User, tags=["Users"], dependencies=[Depends(querybudget.budget(1))])
 async def read_users_me(current_user: models.User = Depends(get_current_user)):
     """
     Get current authenticated user's details.
@@ -324,56 +490,46 @@ async def read_users_me(current_user: models.User = Depends(get_current_user)):
 #                                 API Endpoints for Cart
 # ======================================================================================
 
-@api_app.post("/cart/add", response_model=schemas.CartItem, status_code=status.HTTP_201_CREATED, tags=["Cart"])
+@api_app.post("/cart/add", response_model=schemas.CartItem, status_code=status.HTTP_201_CREATED, tags=["Cart"], dependencies=[Depends(limit_cart)])
 def add_to_cart(cart_item: schemas.CartItemCreate, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
     """
     Add a game to the user's cart or update the quantity if it already exists.
     """
     # Debugging log to inspect the incoming request body
     print(f"Incoming Request Body: {cart_item.dict()}")
-
-    # Check stock availability
-    game = crud.get_game(db, game_id=cart_item.game_id)
-    if not game or game.stock_quantity < cart_item.quantity:
+    if cart_item.quantity <= 0:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Quantity must be at least 1")
+
+    # Check stock availability and hold the cart's total quantity for this game,
+    # so an oversubscribed game fails here rather than at checkout. The game row
+    # stays locked until the commit below, so concurrent adds are checked in turn.
+    stock_quantity = reservations.lock_stock(db, cart_item.game_id)
+    if stock_quantity is None:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Insufficient stock available")
+    db_cart_item = db.query(models.CartItem).filter(
+        models.CartItem.user_id == current_user.user_id,
+        models.CartItem.game_id == cart_item.game_id
+    ).first()
+    in_cart = db_cart_item.quantity if db_cart_item and db_cart_item.created_at >= carts.cart_cutoff() else 0
+    quantity = cart_item.quantity + in_cart
+    if not reservations.can_hold(db, current_user.user_id, cart_item.game_id, quantity, stock_quantity):
+        db.rollback()
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Insufficient stock available")
 
-    # SQL query to insert or update the cart item
-    existing_cart_item = db.execute(
-        text("""
-        SELECT * FROM CartItems
-        WHERE user_id = :user_id AND game_id = :game_id
-        """),
-        {"user_id": current_user.user_id, "game_id": cart_item.game_id}
-    ).fetchone()
-
-    if existing_cart_item:
-        # Update the quantity if the item already exists in the cart
-        db.execute(
-            text("""
-            UPDATE CartItems
-            SET quantity = quantity + :quantity
-            WHERE user_id = :user_id AND game_id = :game_id
-            """),
-            {"quantity": cart_item.quantity, "user_id": current_user.user_id, "game_id": cart_item.game_id}
-        )
+    # Insert the cart item, or set the new total and restart its hold and expiry if it is already there
+    if db_cart_item:
+        db_cart_item.quantity = quantity  # an expired row starts over from the requested quantity
+        db_cart_item.created_at = datetime.utcnow()
     else:
-        # Insert a new cart item
-        db.execute(
-            text("""
-            INSERT INTO CartItems (user_id, game_id, quantity, created_at)
-            VALUES (:user_id, :game_id, :quantity, GETDATE())
-            """),
-            {"user_id": current_user.user_id, "game_id": cart_item.game_id, "quantity": cart_item.quantity}
-        )
+        db_cart_item = models.CartItem(user_id=current_user.user_id, game_id=cart_item.game_id, quantity=quantity)
+        db.add(db_cart_item)
 
     db.commit()
+    db.refresh(db_cart_item)
 
     # Return the updated or newly added cart item
-    return {
-        "user_id": current_user.user_id,
-        "game_id": cart_item.game_id,
-        "quantity": cart_item.quantity
-    }
+    return db_cart_item
 
 @api_app.post("/cart/items/", include_in_schema=False)
 async def redirect_cart_items():
@@ -382,13 +538,19 @@ async def redirect_cart_items():
     """
     raise HTTPException(status_code=status.HTTP_307_TEMPORARY_REDIRECT, headers={"Location": "/api/cart/add"})
 
-@api_app.get("/cart/", response_model=List[schemas.CartItem], tags=["Cart"])
-def get_cart(db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+@api_app.get("/cart/", response_model=List[schemas.CartItem], tags=["Cart"], dependencies=[Depends(querybudget.budget(2))])
+def get_cart(request: Request, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
     """
-    Retrieve all items in the user's cart, with game info eagerly loaded.
+    Retrieve all items in the user's cart, with game info from the same query.
     """
-    cart_items = db.query(models.CartItem).options(joinedload(models.CartItem.game)).filter(models.CartItem.user_id == current_user.user_id).all()
-    return cart_items
+    return fastjson.render(request, crud.get_cart_rows(db, user_id=current_user.user_id))
+
+@api_app.get("/cart/summary", response_model=schemas.CartSummary, tags=["Cart"], dependencies=[Depends(querybudget.budget(2))])
+def get_cart_summary(request: Request, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+    """
+    Cart lines with line totals, availability flags and the subtotal, computed server-side.
+    """
+    return fastjson.render(request, carts.get_summary(db, user_id=current_user.user_id))
 
 @api_app.put("/cart/{cart_item_id}", response_model=schemas.CartItem, tags=["Cart"])
 def update_cart_item(cart_item_id: int, cart_item_update: schemas.CartItemUpdate, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
@@ -398,6 +560,12 @@ def update_cart_item(cart_item_id: int, cart_item_update: schemas.CartItemUpdate
     db_cart_item = crud.get_cart_item_by_id(db, cart_item_id=cart_item_id)
     if not db_cart_item or db_cart_item.user_id != current_user.user_id:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Cart item not found")
+    if cart_item_update.quantity <= 0:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Quantity must be at least 1")
+    stock_quantity = reservations.lock_stock(db, db_cart_item.game_id)
+    if stock_quantity is None or not reservations.can_hold(db, current_user.user_id, db_cart_item.game_id, cart_item_update.quantity, stock_quantity):
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Insufficient stock available")
     updated_cart_item = crud.update_cart_item(db, cart_item_id=cart_item_id, quantity=cart_item_update.quantity)
     return updated_cart_item
 
@@ -413,49 +581,289 @@ def delete_cart_item(cart_item_id: int, db: Session = Depends(get_db), current_u
     return deleted_cart_item
 
 @api_app.post("/cart/checkout", response_model=schemas.Order, status_code=status.HTTP_201_CREATED, tags=["Cart"])
-def checkout_cart(db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+def checkout_cart(
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
     """
     Convert the user's cart into an order and clear the cart.
+    Retries carrying the same Idempotency-Key get the original order back.
     """
-    cart_items = crud.get_user_cart(db, user_id=current_user.user_id)
-    if not cart_items:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cart is empty")
-    # Create an order from the cart items
-    order_items = [schemas.OrderItemCreate(game_id=item.game_id, quantity=item.quantity) for item in cart_items]
-    order = schemas.OrderCreate(user_id=current_user.user_id, order_items=order_items)
-    db_order = crud.create_order(db=db, order=order)
-    # Clear the cart
-    for item in cart_items:
-        crud.delete_cart_item(db, cart_item_id=item.id)
+    scope = f"checkout:{current_user.user_id}"
+    replay = idempotency.store.lookup(scope, idempotency_key, idempotency.fingerprint("POST /cart/checkout"))
+    if replay is not None:
+        return replay
 
-    return db_order
+    db_order = None
+    try:
+        cart_items = crud.get_user_cart(db, user_id=current_user.user_id)
+        if not cart_items:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cart is empty")
+        # Create an order from the cart items
+        order_items = [schemas.OrderItemCreate(game_id=item.game_id, quantity=item.quantity) for item in cart_items]
+        order = schemas.OrderCreate(user_id=current_user.user_id, order_items=order_items)
+        db_order = crud.create_order(db=db, order=order)
+        # Clear the cart
+        for item in cart_items:
+            crud.delete_cart_item(db, cart_item_id=item.id)
+    except Exception:
+        if db_order is None:
+            idempotency.store.release(scope, idempotency_key)
+        else:
+            # The order is committed: a retry must get it back, not place a second one
+            db.rollback()
+            idempotency.store.save(scope, idempotency_key, status.HTTP_201_CREATED, schemas.Order.model_validate(db_order))
+        raise
+
+    return idempotency.store.save(scope, idempotency_key, status.HTTP_201_CREATED, schemas.Order.model_validate(db_order))
 
 # ======================================================================================
 #                                 API Endpoints for Payments
 # ======================================================================================
 
 @api_app.post("/payments/", response_model=schemas.Payment, status_code=status.HTTP_201_CREATED, tags=["Payments"])
-def process_payment(payment: schemas.PaymentCreate, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+def process_payment(
+    payment: schemas.PaymentCreate,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
     """
     Process a payment for an order.
+    Retries carrying the same Idempotency-Key get the original payment back.
+    """
+    scope = f"payment:{current_user.user_id}"
+    replay = idempotency.store.lookup(scope, idempotency_key, idempotency.fingerprint("POST /payments/", payment.model_dump_json()))
+    if replay is not None:
+        return replay
+
+    try:
+        order = crud.get_order(db, order_id=payment.order_id)
+        if not order or order.user_id != current_user.user_id:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Order not found")
+
+        if float(order.total_price) != payment.amount_paid:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Payment amount does not match order total")
+
+        # Payments.order_id is unique; report a second payment instead of failing on the constraint
+        if db.query(models.Payment.payment_id).filter(models.Payment.order_id == order.order_id).first() is not None:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Order has already been paid")
+        if order.status.lower() != "pending":
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Order is {order.status.lower()} and can't be paid")
+
+        # Simulate payment processing (handled in CRUD). The order status update
+        # and analytics run on the job queue after the payment commits.
+        db_payment = crud.create_payment(db=db, payment=payment, order=order)
+    except Exception:
+        idempotency.store.release(scope, idempotency_key)
+        raise
+
+    return idempotency.store.save(scope, idempotency_key, status.HTTP_201_CREATED, schemas.Payment.model_validate(db_payment))
+
+# ======================================================================================
+#                                 API Endpoints for Admin Exports
+# ======================================================================================
+
+def _naive_utc(moment: datetime) -> datetime:
+    if moment.tzinfo is None:
+        return moment
+    return moment.astimezone(timezone.utc).replace(tzinfo=None)
+
+@api_app.get("/admin/export/{table}", tags=["Admin"])
+def export_table(
+    table: str,
+    start: datetime,
+    end: Optional[datetime] = None,
+    format: str = "csv",
+    current_admin: models.User = Depends(get_current_admin_user)
+):
+    """
+    Stream Orders, OrderItems or Payments in [start, end) as csv, jsonl or columnar chunks.
+    """
+    if table not in export.EXPORT_TABLES:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Unknown export table '{table}'")
+    if format not in export.EXPORT_FORMATS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unsupported export format '{format}'")
+    # The tables store naive UTC; bring aware bounds (e.g. ...Z or +02:00) to the same form
+    start, end = (_naive_utc(bound) for bound in (start, end or datetime.utcnow()))
+    if end <= start:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="'end' must be after 'start'")
+
+    extension = "csv" if format == "csv" else "jsonl"
+    filename = f"{table}_{start:%Y%m%d}_{end:%Y%m%d}.{extension}"
+    return StreamingResponse(
+        export.stream_export(table, start, end, format),
+        media_type=export.EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+# ======================================================================================
+#                                 API Endpoints for Admin Analytics
+# ======================================================================================
+
+def _analytics_window(start: Optional[date], end: Optional[date]):
+    end = end or date.today()
+    start = start or end - timedelta(days=30)
+    return start, end
+
+@api_app.get("/admin/analytics/top-sellers", response_model=List[schemas.TopSeller], tags=["Admin"], dependencies=[Depends(querybudget.budget(2))])
+def read_top_sellers(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    limit: int = 10,
+    metric: str = "units",
+    db: Session = Depends(get_db),
+    current_admin: models.User = Depends(get_current_admin_user)
+):
+    """
+    Best selling games by units or revenue over a date window (default: last 30 days).
+    """
+    start, end = _analytics_window(start, end)
+    if metric not in analytics.TOP_SELLER_METRICS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown metric '{metric}'; use one of: {', '.join(analytics.TOP_SELLER_METRICS)}")
+    return analytics.top_sellers(db, start, end, limit=limit, metric=metric)
+
+@api_app.get("/admin/analytics/revenue", response_model=List[schemas.RevenuePoint], tags=["Admin"], dependencies=[Depends(querybudget.budget(2))])
+def read_revenue_over_time(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    genre: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_admin: models.User = Depends(get_current_admin_user)
+):
+    """
+    Daily ordered and paid revenue, optionally for a single genre.
+    """
+    start, end = _analytics_window(start, end)
+    return analytics.revenue_over_time(db, start, end, genre=genre)
+
+@api_app.get("/admin/analytics/inventory-turnover", response_model=List[schemas.InventoryTurnover], tags=["Admin"], dependencies=[Depends(querybudget.budget(2))])
+def read_inventory_turnover(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    limit: int = 100,
+    db: Session = Depends(get_db),
+    current_admin: models.User = Depends(get_current_admin_user)
+):
+    """
+    Inventory turnover per game over a date window.
     """
-    order = crud.get_order(db, order_id=payment.order_id)
-    if not order or order.user_id != current_user.user_id:
+    start, end = _analytics_window(start, end)
+    return analytics.inventory_turnover(db, start, end, limit=limit)
+
+@api_app.post("/admin/analytics/backfill", tags=["Admin"])
+def backfill_analytics(db: Session = Depends(get_db), current_admin: models.User = Depends(get_current_admin_user)):
+    """
+    Rebuild the sales rollups from order history.
+    """
+    return {"rows": analytics.backfill(db)}
+
+# ======================================================================================
+#                                 API Endpoints for Background Jobs
+# ======================================================================================
+
+@api_app.get("/admin/jobs/stats", response_model=schemas.JobQueueStats, tags=["Admin"])
+def read_job_queue_stats(db: Session = Depends(get_db), current_admin: models.User = Depends(get_current_admin_user)):
+    """
+    Queue depth per status and recent wait/run latency, for monitoring.
+    """
+    return jobs.queue_stats(db)
+
+@api_app.get("/admin/jobs/dead", response_model=List[schemas.Job], tags=["Admin"], dependencies=[Depends(querybudget.budget(2))])
+def read_dead_jobs(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_admin: models.User = Depends(get_current_admin_user)):
+    """
+    Jobs that exhausted their retries (dead-letter list).
+    """
+    return jobs.get_dead_jobs(db, skip=skip, limit=limit)
+
+@api_app.post("/admin/jobs/{job_id}/retry", response_model=schemas.Job, tags=["Admin"])
+def retry_dead_job(job_id: int, db: Session = Depends(get_db), current_admin: models.User = Depends(get_current_admin_user)):
+    """
+    Put a dead job back on the queue.
+    """
+    db_job = jobs.retry_job(db, job_id=job_id)
+    if db_job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Dead job not found")
+    return db_job
+
+# ======================================================================================
+#                                 API Endpoints for Order Fulfilment
+# ======================================================================================
+
+@api_app.post("/admin/orders/claim", response_model=List[schemas.Order], tags=["Admin"])
+def claim_orders(limit: int = crud.ORDER_CLAIM_BATCH, db: Session = Depends(get_db), current_admin: models.User = Depends(get_current_admin_user)):
+    """
+    Claim the oldest paid orders for fulfilment; they move to processing.
+    Concurrent workers each get a disjoint batch. An empty list means the queue is drained.
+    """
+    if not 0 < limit <= 100:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="limit must be between 1 and 100")
+    return crud.claim_paid_orders(db, limit=limit)
+
+@api_app.put("/admin/orders/{order_id}/status", response_model=schemas.Order, tags=["Admin"])
+def update_order_status_endpoint(order_id: int, update: schemas.OrderStatusUpdate, db: Session = Depends(get_db), current_admin: models.User = Depends(get_current_admin_user)):
+    """
+    Move an order along its lifecycle (e.g. processing -> shipped). Illegal moves return 409;
+    cancelling puts the stock back.
+    """
+    db_order = crud.update_order_status(db, order_id=order_id, new_status=update.status)
+    if db_order is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Order not found")
+    return db_order
 
-    if float(order.total_price) != payment.amount_paid:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Payment amount does not match order total")
+# ======================================================================================
+#                                 API Endpoints for Price Rules
+# ======================================================================================
 
-    # Simulate payment processing (handled in CRUD)
-    db_payment = crud.create_payment(db=db, payment=payment, order=order)
+@api_app.post("/admin/price-rules", response_model=schemas.PriceRule, status_code=status.HTTP_201_CREATED, tags=["Admin"])
+def create_price_rule(rule: schemas.PriceRuleCreate, db: Session = Depends(get_db), current_admin: models.User = Depends(get_current_admin_user)):
+    """
+    Schedule a sale. A rule whose window is already open starts immediately;
+    otherwise the pricing job starts and ends it on schedule.
+    """
+    if (rule.percent_off is None) == (rule.fixed_price is None):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Give exactly one of percent_off and fixed_price")
+    if rule.percent_off is not None and not 0 < rule.percent_off < 100:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="percent_off must be between 0 and 100")
+    if rule.fixed_price is not None and rule.fixed_price < 0:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="fixed_price cannot be negative")
+    if rule.ends_at <= rule.starts_at:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="'ends_at' must be after 'starts_at'")
+    if rule.game_id is not None and crud.get_game(db, game_id=rule.game_id) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Game not found")
+    return pricing.create_rule(db, rule)
 
-    # Update order status
-    crud.update_order_status(db=db, order_id=order.order_id, status="Paid")
-    return db_payment
+@api_app.get("/admin/price-rules", response_model=List[schemas.PriceRule], tags=["Admin"])
+def read_price_rules(status: Optional[str] = None, skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_admin: models.User = Depends(get_current_admin_user)):
+    """
+    Price rules, latest start first, optionally filtered by status (scheduled, active, ended).
+    """
+    return pricing.get_rules(db, status=status, skip=skip, limit=limit)
+
+@api_app.post("/admin/price-rules/{rule_id}/end", response_model=schemas.PriceRule, tags=["Admin"])
+def end_price_rule(rule_id: int, db: Session = Depends(get_db), current_admin: models.User = Depends(get_current_admin_user)):
+    """
+    End a sale now (or cancel one that has not started yet).
+    """
+    db_rule = pricing.end_rule(db, rule_id=rule_id)
+    if db_rule is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Price rule not found")
+    return db_rule
+
+@api_app.post("/admin/price-rules/apply", tags=["Admin"])
+def apply_price_rules(db: Session = Depends(get_db), current_admin: models.User = Depends(get_current_admin_user)):
+    """
+    Start and end due rules now instead of waiting for the pricing job.
+    """
+    return pricing.apply_due_rules(db)
 
-@app.get("/some-endpoint", tags=["Example"])
 async def some_endpoint():
     """
     Example endpoint to handle the missing route.
     """
-    return {"message": "This is a valid endpoint"}
\ No newline at end of file
+    return {"message": "This is a valid endpoint"}
+
+
+# `uvicorn backend.main:app` (single process) keeps working
+app = create_app()
@@ -0,0 +1,132 @@
+import argparse
+import os
+
+#==============================================================================
+# Management commands
+#
+#   python -m backend.manage migrate                  create missing tables
+#   python -m backend.manage serve --workers 4        migrate once, then serve
+#   python -m backend.manage worker --concurrency 4   standalone job worker
+#
+# Schema creation runs once here instead of in every worker at import time.
+# `serve` starts uvicorn's process manager on the app factory: each worker
+# builds its own app (and DB pool) after the fork, and SIGHUP to the parent
+# restarts the workers one at a time for a graceful reload.
+#
+# `worker` drains the job queue outside the web processes. Its thread count
+# is JOB_WORKER_CONCURRENCY (or --concurrency), separate from the in-app
+# JOB_CONCURRENCY, so web workers can run with JOB_CONCURRENCY=0 while the
+# standalone worker still starts threads from the same environment.
+#==============================================================================
+
+UPLOAD_DIR = "frontend/images"
+
+
+def _add_missing_columns(engine, metadata):
+    """ALTER TABLE ... ADD for nullable model columns an existing table lacks."""
+    from sqlalchemy import inspect
+
+    inspector = inspect(engine)
+    quote = engine.dialect.identifier_preparer.quote
+    for table in metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            if not column.nullable:
+                raise RuntimeError(f"{table.name}.{column.name} is NOT NULL and must be added by hand")
+            with engine.begin() as connection:
+                connection.exec_driver_sql(
+                    f"ALTER TABLE {quote(table.name)} ADD {quote(column.name)} "
+                    f"{column.type.compile(dialect=engine.dialect)} NULL"
+                )
+            print(f"--- MANAGE: Added column {table.name}.{column.name}.")  # DEBUG
+
+
+def migrate():
+    """Create any missing tables, columns, indexes and the upload directory. Safe to run repeatedly."""
+    from backend import models  # registers the tables on Base.metadata
+    from backend.database import Base, engine
+
+    Base.metadata.create_all(bind=engine)
+    # create_all skips tables that already exist, so columns and indexes added to a model later are added here
+    _add_missing_columns(engine, Base.metadata)
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    print("--- MANAGE: Schema is up to date.")  # DEBUG
+
+
+def serve(host: str, port: int, workers: int, reload: bool, run_migrate: bool):
+    import uvicorn
+
+    if run_migrate:
+        migrate()
+        from backend.database import engine
+        engine.dispose()  # don't hand pooled connections to forked workers
+    uvicorn.run(
+        "backend.main:create_app",
+        factory=True,
+        host=host,
+        port=port,
+        workers=None if reload else workers,
+        reload=reload,
+        timeout_graceful_shutdown=int(os.getenv("GRACEFUL_SHUTDOWN_TIMEOUT", "30")),
+    )
+
+
+def worker(concurrency: int):
+    import signal
+    import threading
+
+    from backend import jobs, tasks
+    from backend.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        tasks.schedule_recurring(db)
+    finally:
+        db.close()
+    job_worker = jobs.JobWorker(concurrency=concurrency)
+    job_worker.start()
+    stopping = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stopping.set())
+    try:
+        stopping.wait()
+    except KeyboardInterrupt:
+        pass
+    print("--- MANAGE: Stopping job worker.")  # DEBUG
+    job_worker.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m backend.manage")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("migrate", help="create missing tables")
+
+    serve_parser = commands.add_parser("serve", help="run the API with one or more worker processes")
+    serve_parser.add_argument("--host", default=os.getenv("HOST", "127.0.0.1"))
+    serve_parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    serve_parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "1")))
+    serve_parser.add_argument("--reload", action="store_true", help="development auto-reload (single process)")
+    serve_parser.add_argument("--no-migrate", dest="migrate", action="store_false", help="skip the schema step")
+
+    worker_parser = commands.add_parser("worker", help="run background jobs in this process")
+    worker_parser.add_argument("--concurrency", type=int, default=int(os.getenv("JOB_WORKER_CONCURRENCY", "2")),
+                               help="worker threads (default JOB_WORKER_CONCURRENCY or 2)")
+
+    args = parser.parse_args(argv)
+    if args.command == "migrate":
+        migrate()
+    elif args.command == "worker":
+        if args.concurrency < 1:
+            parser.error("--concurrency must be at least 1")
+        worker(args.concurrency)
+    else:
+        serve(args.host, args.port, args.workers, args.reload, args.migrate)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DECIMAL, DATE, DateTime, ForeignKey, Numeric, Float
+from sqlalchemy import Column, Integer, String, DECIMAL, DATE, DateTime, ForeignKey, Numeric, Float, Text, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from .database import Base
 from datetime import datetime
@@ -11,12 +11,15 @@ class Order(Base):
     user_id = Column(Integer, ForeignKey("Users.user_id"), nullable=False)
     order_date = Column(DateTime, nullable=False, default=datetime.utcnow)
     total_price = Column(Numeric(10, 2), nullable=False)  # Store total price with 2 decimal places
-    status = Column(String(50), nullable=False, default="pending")  # e.g., pending, processing, shipped, delivered, cancelled
+    status = Column(String(50), nullable=False, default="pending")  # pending, paid, processing, shipped, delivered, cancelled (see crud.ORDER_TRANSITIONS)
 
     user = relationship("User", back_populates="orders")
     order_items = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan")  # Cascade delete
     payment = relationship("Payment", back_populates="order", uselist=False)
 
+    # Fulfilment workers poll for the oldest paid orders
+    __table_args__ = (Index("ix_Orders_status_order_date", "status", "order_date"),)
+
 
 class OrderItem(Base):
     __tablename__ = "OrderItems"
@@ -50,6 +53,7 @@ class Game(Base):
     title = Column(String(150), nullable=False)
     description = Column(String, nullable=True)
     price = Column(Numeric(10, 2), nullable=False)
+    sale_price = Column(Numeric(10, 2), nullable=True)  # Set by backend.pricing while a price rule is running
     genre = Column(String(50), nullable=True)
     platform = Column(String(50), nullable=True)
     release_date = Column(DATE, nullable=True)
@@ -63,14 +67,17 @@ class CartItem(Base):
     __tablename__ = "CartItems"
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
-    user_id = Column(Integer, ForeignKey("Users.user_id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("Users.user_id"), nullable=False, index=True)
     game_id = Column(Integer, ForeignKey("Games.game_id"), nullable=False)
     quantity = Column(Integer, nullable=False, default=1)
-    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)  # Items expire CART_TTL_HOURS after this
 
     user = relationship("User", back_populates="cart_items")
     game = relationship("Game")
 
+    # Stock held per game sums live rows by game (backend.reservations)
+    __table_args__ = (Index("ix_CartItems_game_id_created_at", "game_id", "created_at"),)
+
 
 class Payment(Base):
     __tablename__ = "Payments"
@@ -83,4 +90,81 @@ class Payment(Base):
     transaction_id = Column(String(100), nullable=True)
     payment_status = Column(String(50), default="Pending", nullable=False)
 
-    order = relationship("Order", back_populates="payment")
\ No newline at end of file
+    order = relationship("Order", back_populates="payment")
+
+
+class SalesRollup(Base):
+    """Per-day, per-game sales aggregates maintained incrementally by backend.analytics."""
+    __tablename__ = "SalesDaily"
+
+    day = Column(DATE, primary_key=True, index=True)
+    game_id = Column(Integer, ForeignKey("Games.game_id"), primary_key=True)
+    genre = Column(String(50), nullable=True)
+    units_ordered = Column(Integer, nullable=False, default=0)
+    revenue_ordered = Column(Numeric(12, 2), nullable=False, default=0)
+    units_paid = Column(Integer, nullable=False, default=0)
+    revenue_paid = Column(Numeric(12, 2), nullable=False, default=0)
+
+
+class Job(Base):
+    """Background work item processed by backend.jobs workers."""
+    __tablename__ = "Jobs"
+
+    job_id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    kind = Column(String(100), nullable=False)
+    payload = Column(Text, nullable=False, default="{}")  # JSON encoded arguments
+    status = Column(String(20), nullable=False, default="queued")  # queued, running, done, dead
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=5)
+    run_after = Column(DateTime, nullable=False, default=datetime.utcnow)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (Index("ix_Jobs_status_run_after", "status", "run_after"),)
+
+
+class IdempotencyKey(Base):
+    """Stored outcome of a request sent with an Idempotency-Key (see backend.idempotency)."""
+    __tablename__ = "IdempotencyKeys"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    scope = Column(String(100), nullable=False)
+    key = Column(String(255), nullable=False)
+    fingerprint = Column(String(32), nullable=False)  # hex digest of the request
+    status_code = Column(Integer, nullable=True)  # NULL while the first request is still running
+    body = Column(Text, nullable=True)  # JSON encoded response
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+    __table_args__ = (UniqueConstraint("scope", "key", name="uq_IdempotencyKeys_scope_key"),)
+
+
+class PriceRule(Base):
+    """Scheduled sale for one game, a genre or a platform (all games when none is set), applied by backend.pricing."""
+    __tablename__ = "PriceRules"
+
+    rule_id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    name = Column(String(100), nullable=False)
+    game_id = Column(Integer, ForeignKey("Games.game_id"), nullable=True)
+    genre = Column(String(50), nullable=True)
+    platform = Column(String(50), nullable=True)
+    percent_off = Column(Numeric(5, 2), nullable=True)  # Either a discount...
+    fixed_price = Column(Numeric(10, 2), nullable=True)  # ...or a flat sale price
+    starts_at = Column(DateTime, nullable=False)
+    ends_at = Column(DateTime, nullable=False)
+    status = Column(String(20), nullable=False, default="scheduled")  # scheduled, active, ended
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (Index("ix_PriceRules_status_starts_at", "status", "starts_at"),)
+
+
+class CatalogEvent(Base):
+    """Catalog feed event, relayed to the other worker processes by backend.events."""
+    __tablename__ = "CatalogEvents"
+
+    event_id = Column(Integer, primary_key=True, autoincrement=True)
+    origin = Column(String(32), nullable=False)  # process that published it
+    body = Column(Text, nullable=False)  # JSON encoded event
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
@@ -0,0 +1,210 @@
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, List, Optional
+
+from sqlalchemy import Numeric, and_, func, literal, or_, select, true, update
+from sqlalchemy.orm import Session
+
+from backend import models
+from .database import run_in_background
+from .events import catalog_feed
+
+logger = logging.getLogger(__name__)
+
+#==============================================================================
+# Scheduled price rules
+#
+# A PriceRule discounts one game, a genre or a platform (every game when none
+# is set) between starts_at and ends_at. Rules are not evaluated per request:
+# `apply_due_rules` runs on the job queue every PRICE_RULE_INTERVAL seconds
+# and, for each rule that started or ended, issues one set-wise UPDATE of
+# Games.sale_price. A sale over thousands of titles is a single statement and
+# a single "catalog.prices" event, not a storm of per-game updates.
+#
+# Where rules overlap, the lowest price wins. Ending a rule clears sale_price
+# for the games in its scope and re-applies the rules still running there.
+#
+# `prices` is the in-memory price table (game_id -> sale price, only games on
+# sale) that checkout, the cart summary and the catalog listing read. The
+# process that applies rules reloads it at once; other processes pick the
+# change up within PRICE_TABLE_TTL seconds.
+#==============================================================================
+
+PRICE_RULE_INTERVAL = int(os.getenv("PRICE_RULE_INTERVAL", "60"))
+PRICE_TABLE_TTL = float(os.getenv("PRICE_TABLE_TTL", "30"))
+
+
+def _scope(rule: models.PriceRule):
+    """WHERE clause selecting the games a rule applies to."""
+    clauses = []
+    if rule.game_id is not None:
+        clauses.append(models.Game.game_id == rule.game_id)
+    if rule.genre:
+        clauses.append(models.Game.genre == rule.genre)
+    if rule.platform:
+        clauses.append(models.Game.platform == rule.platform)
+    return and_(true(), *clauses)
+
+
+def _rule_price(rule: models.PriceRule):
+    if rule.fixed_price is not None:
+        return literal(rule.fixed_price, Numeric(10, 2))
+    factor = (Decimal(100) - Decimal(rule.percent_off)) / 100
+    return func.round(models.Game.price * literal(factor, Numeric(7, 4)), 2)
+
+
+def _apply_rule(db: Session, rule: models.PriceRule, *where) -> int:
+    """Lower sale_price to the rule's price for the games in scope (and `where`). One UPDATE."""
+    new_price = _rule_price(rule)
+    result = db.execute(
+        update(models.Game)
+        .where(_scope(rule), *where, new_price < models.Game.price)
+        .where(or_(models.Game.sale_price.is_(None), models.Game.sale_price > new_price))
+        .values(sale_price=new_price)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+
+def reprice(db: Session, *where) -> None:
+    """
+    Recompute sale_price from the running rules for the games matching `where`.
+    Used when a rule ends and when a game's list price, genre or platform changes.
+    The caller commits.
+    """
+    db.execute(
+        update(models.Game)
+        .where(*where, models.Game.sale_price.is_not(None))
+        .values(sale_price=None)
+        .execution_options(synchronize_session=False)
+    )
+    running = db.execute(select(models.PriceRule).where(models.PriceRule.status == "active")).scalars().all()
+    for rule in running:
+        _apply_rule(db, rule, *where)
+
+
+def apply_due_rules(db: Session, now: Optional[datetime] = None) -> dict:
+    """Start the rules whose window has opened and end those whose window has closed."""
+    now = now or datetime.utcnow()
+    due = db.execute(
+        select(models.PriceRule)
+        .where(
+            models.PriceRule.status.in_(("scheduled", "active")),
+            or_(
+                and_(models.PriceRule.status == "scheduled", models.PriceRule.starts_at <= now),
+                models.PriceRule.ends_at <= now,
+            ),
+        )
+        .order_by(models.PriceRule.rule_id)
+    ).scalars().all()
+    if not due:
+        return {"started": [], "ended": []}
+
+    started: List[models.PriceRule] = []
+    ended: List[models.PriceRule] = []
+    for rule in due:
+        if rule.ends_at <= now:
+            if rule.status == "active":
+                ended.append(rule)  # a scheduled rule whose window already passed never touched a price
+            rule.status = "ended"
+        else:
+            rule.status = "active"
+            started.append(rule)
+    db.flush()
+
+    # Ended first: re-applying the running rules in their scope also covers the rules just started
+    for rule in ended:
+        reprice(db, _scope(rule))
+    for rule in started:
+        _apply_rule(db, rule)
+    db.commit()
+
+    summary = {"started": [rule.rule_id for rule in started], "ended": [rule.rule_id for rule in ended]}
+    if started or ended:
+        logger.info("Started price rules %s, ended rules %s", summary["started"], summary["ended"])
+        prices.reload(db)
+        catalog_feed.publish({"type": "catalog.prices", **summary})
+    return summary
+
+
+#==============================================================================
+# In-memory price table
+#==============================================================================
+
+class PriceTable:
+    def __init__(self, ttl: float = PRICE_TABLE_TTL):
+        self.ttl = ttl
+        self.loaded_at = 0.0  # time.monotonic() of the last load; 0 = never loaded
+        self._sale: Dict[int, Decimal] = {}  # game_id -> sale price, games on sale only
+        self._reload_lock = threading.Lock()
+
+    def effective_price(self, game_id: int, price: Decimal) -> Decimal:
+        return self._sale.get(game_id, price)
+
+    def annotate(self, games: List[dict]):
+        """Add effective_price to catalog rows that carry game_id and price."""
+        for game in games:
+            game["effective_price"] = self._sale.get(game["game_id"], game["price"])
+
+    def reload(self, db: Session):
+        with self._reload_lock:
+            rows = db.execute(
+                select(models.Game.game_id, models.Game.sale_price).where(models.Game.sale_price.is_not(None))
+            ).all()
+            self._sale = {game_id: sale_price for game_id, sale_price in rows}  # swapped whole, never half-built
+            self.loaded_at = time.monotonic()
+
+    def reload_in_background(self) -> bool:
+        """Reload on a daemon thread unless a reload is already running."""
+        return run_in_background(self.reload, self._reload_lock, "price-table-reload")
+
+    def maybe_reload(self):
+        if time.monotonic() - self.loaded_at >= self.ttl:
+            self.reload_in_background()
+
+    def ensure_loaded(self, db: Session):
+        """For checkout: load synchronously the first time, so nothing is ever charged off an empty table."""
+        if self.loaded_at == 0.0:
+            self.reload(db)
+        else:
+            self.maybe_reload()
+
+
+prices = PriceTable()
+
+
+#==============================================================================
+# Rule management (admin API)
+#==============================================================================
+
+def create_rule(db: Session, rule) -> models.PriceRule:
+    db_rule = models.PriceRule(**rule.model_dump())
+    db.add(db_rule)
+    db.commit()
+    apply_due_rules(db)  # a rule that is already open starts now, not at the next tick
+    db.refresh(db_rule)
+    return db_rule
+
+
+def get_rules(db: Session, status: Optional[str] = None, skip: int = 0, limit: int = 100) -> List[models.PriceRule]:
+    query = db.query(models.PriceRule)
+    if status:
+        query = query.filter(models.PriceRule.status == status)
+    return query.order_by(models.PriceRule.starts_at.desc()).offset(skip).limit(limit).all()
+
+
+def end_rule(db: Session, rule_id: int) -> Optional[models.PriceRule]:
+    """Close a rule's window now and take its prices down."""
+    db_rule = db.query(models.PriceRule).filter(models.PriceRule.rule_id == rule_id).first()
+    if db_rule is None:
+        return None
+    if db_rule.status != "ended":
+        db_rule.ends_at = min(db_rule.ends_at, datetime.utcnow())
+        db.commit()
+        apply_due_rules(db, now=db_rule.ends_at)
+        db.refresh(db_rule)
+    return db_rule
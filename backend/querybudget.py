@@ -0,0 +1,97 @@
+import logging
+import os
+from contextvars import ContextVar
+from typing import List, Optional
+
+from fastapi import Request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, raiseload
+
+logger = logging.getLogger(__name__)
+
+#==============================================================================
+# Per-request SQL statement budgets
+#
+# Routes declare how many statements they may run:
+#
+#     @api_app.get("/games/", dependencies=[Depends(querybudget.budget(1))])
+#
+# With QUERY_BUDGET_MODE=log (or raise), every statement executed while the
+# request is handled, response serialization included, is counted. Going over
+# budget logs the offending statements, or raises QueryBudgetExceeded. With
+# the default mode (off) the dependency does nothing.
+#
+# QUERY_BUDGET_RAISELOAD=1 additionally applies raiseload("*") to every ORM
+# query, so a relationship that is not eagerly loaded raises on access
+# instead of quietly issuing another SELECT.
+#==============================================================================
+
+QUERY_BUDGET_MODE = os.getenv("QUERY_BUDGET_MODE", "off").lower()  # off, log, raise
+QUERY_BUDGET_RAISELOAD = os.getenv("QUERY_BUDGET_RAISELOAD", "0") == "1"
+
+
+class QueryBudgetExceeded(RuntimeError):
+    pass
+
+
+class QueryTracker:
+    def __init__(self, name: str, limit: int):
+        self.name = name
+        self.limit = limit
+        self.statements: List[str] = []
+
+    def report(self) -> str:
+        lines = [f"{self.name}: {len(self.statements)} statements, budget {self.limit}"]
+        lines += [f"  [{i}] {' '.join(statement.split())}" for i, statement in enumerate(self.statements, 1)]
+        return "\n".join(lines)
+
+
+# Set by the budget dependency. Sync endpoints run in the threadpool with a
+# copy of the request's context, so they see (and append to) the same tracker.
+_tracker: ContextVar[Optional[QueryTracker]] = ContextVar("query_tracker", default=None)
+
+
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    tracker = _tracker.get()
+    if tracker is not None:
+        tracker.statements.append(statement)
+
+
+def _raiseload_by_default(state):
+    if state.is_select and not state.is_column_load and not state.is_relationship_load:
+        state.statement = state.statement.options(raiseload("*"))
+
+
+def install(mode: str = QUERY_BUDGET_MODE, raiseload_default: bool = QUERY_BUDGET_RAISELOAD):
+    """Register the engine/session listeners (called at import with the env settings)."""
+    global QUERY_BUDGET_MODE
+    QUERY_BUDGET_MODE = mode
+    if mode != "off" and not event.contains(Engine, "before_cursor_execute", _count_statement):
+        event.listen(Engine, "before_cursor_execute", _count_statement)
+    if raiseload_default and not event.contains(Session, "do_orm_execute", _raiseload_by_default):
+        event.listen(Session, "do_orm_execute", _raiseload_by_default)
+
+
+def budget(limit: int):
+    """FastAPI dependency allowing at most `limit` SQL statements for the request."""
+
+    async def query_budget(request: Request):
+        if QUERY_BUDGET_MODE == "off":
+            yield
+            return
+        tracker = QueryTracker(f"{request.method} {request.url.path}", limit)
+        token = _tracker.set(tracker)
+        try:
+            yield
+        finally:
+            _tracker.reset(token)
+        if len(tracker.statements) > limit:
+            if QUERY_BUDGET_MODE == "raise":
+                raise QueryBudgetExceeded(tracker.report())
+            logger.warning("Query budget exceeded by %s", tracker.report())
+
+    return query_budget
+
+
+install()
@@ -0,0 +1,162 @@
+import abc
+import importlib
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException, Request, status
+from fastapi.responses import JSONResponse
+
+from . import database
+
+#==============================================================================
+# Rate limiting
+#
+# Token buckets keyed by client IP and, where known, by user. Bucket state
+# lives in a backend: the default keeps it in process memory and drops
+# buckets that have been idle longer than it takes them to refill, so the
+# store only tracks recently seen clients. Memory buckets are per process:
+# with N workers a client gets up to N times the configured rate. To share
+# buckets, point RATE_LIMIT_BACKEND at a RateLimitBackend subclass
+# ("package.module:Class") that keeps them in a shared store.
+#==============================================================================
+
+TRUST_PROXY_HEADERS = os.getenv("TRUST_PROXY_HEADERS", "0") == "1"
+
+
+class RateLimitBackend(abc.ABC):
+    """Stores bucket state. `take` returns 0 when allowed, else seconds to wait."""
+
+    @abc.abstractmethod
+    def take(self, key: str, rate: float, burst: int) -> float:
+        ...
+
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    def __init__(self, sweep_every: int = 10000):
+        self._buckets: Dict[str, List[float]] = {}  # key -> [tokens, last_seen, idle_after]
+        self._lock = threading.Lock()
+        self._sweep_every = sweep_every
+        self._calls = 0
+
+    def take(self, key: str, rate: float, burst: int) -> float:
+        now = time.monotonic()
+        with self._lock:
+            self._calls += 1
+            if self._calls % self._sweep_every == 0:
+                self._sweep(now)
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [float(burst), now, burst / rate]
+            tokens = min(burst, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+            if tokens >= 1:
+                bucket[0] = tokens - 1
+                return 0.0
+            bucket[0] = tokens
+            return (1 - tokens) / rate
+
+    def _sweep(self, now: float):
+        # A bucket idle for burst/rate seconds is full again, so forgetting it changes nothing
+        idle = [key for key, (tokens, last_seen, idle_after) in self._buckets.items() if now - last_seen > idle_after]
+        for key in idle:
+            del self._buckets[key]
+
+
+def _load_backend() -> RateLimitBackend:
+    path = os.getenv("RATE_LIMIT_BACKEND")
+    if not path:
+        return MemoryRateLimitBackend()
+    module_name, _, class_name = path.partition(":")
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+backend = _load_backend()
+
+
+def client_ip(request: Request) -> str:
+    if TRUST_PROXY_HEADERS:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+class RateLimit:
+    """
+    A named limit of `rate` requests per second with bursts up to `burst`,
+    applied separately per client IP and per identity (user id or login).
+    """
+
+    def __init__(self, name: str, rate: float, burst: int):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+
+    def check(self, request: Request, identity: Optional[str] = None):
+        keys = [f"{self.name}:ip:{client_ip(request)}"]
+        if identity is not None:
+            keys.append(f"{self.name}:id:{identity}")
+        for key in keys:
+            retry_after = backend.take(key, self.rate, self.burst)
+            if retry_after:
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Too many requests. Please slow down.",
+                    headers={"Retry-After": str(max(1, round(retry_after)))},
+                )
+
+
+#==============================================================================
+# Load shedding
+#==============================================================================
+
+MAX_IN_FLIGHT = int(os.getenv("MAX_IN_FLIGHT", "200"))
+DB_POOL_SHED_RATIO = float(os.getenv("DB_POOL_SHED_RATIO", "1.0"))
+
+
+def db_pool_saturated() -> bool:
+    """
+    True when every pooled connection (including overflow) is checked out,
+    i.e. a new request would have to wait for the pool.
+    """
+    if not database.engine_started():
+        return False  # nothing has connected yet
+    pool = database.get_engine().pool
+    if not hasattr(pool, "size") or not hasattr(pool, "checkedout"):
+        return False
+    capacity = pool.size() + max(getattr(pool, "_max_overflow", 0), 0)
+    return capacity > 0 and pool.checkedout() >= capacity * DB_POOL_SHED_RATIO
+
+
+class LoadSheddingMiddleware:
+    """
+    Reject requests with 503 before they queue up when too many are already
+    in flight or the DB pool is exhausted, instead of letting latency grow
+    until clients time out.
+    """
+
+    def __init__(self, app, max_in_flight: int = MAX_IN_FLIGHT, exempt_paths=("/catalog/stream", "/admin/export/")):
+        self.app = app
+        self.max_in_flight = max_in_flight
+        self.exempt_paths = exempt_paths  # long-lived streams would otherwise hold a slot for their whole life
+        self.in_flight = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or any(path in scope["path"] for path in self.exempt_paths):
+            await self.app(scope, receive, send)
+            return
+        if self.in_flight >= self.max_in_flight or db_pool_saturated():
+            response = JSONResponse(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                content={"detail": "Server is busy. Please retry shortly."},
+                headers={"Retry-After": "1"},
+            )
+            await response(scope, receive, send)
+            return
+        self.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight -= 1
@@ -0,0 +1,117 @@
+import heapq
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from itertools import combinations, groupby
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from backend import models
+from .database import run_in_background
+
+logger = logging.getLogger(__name__)
+
+#==============================================================================
+# "Customers also bought" recommendations
+#
+# A sparse co-purchase matrix (game_id -> {other game_id: orders containing
+# both}) is built from OrderItems streamed in yield_per batches, one order at
+# a time. After each batch only the games it touched get their top-K
+# neighbour list recomputed, and those lists are what the API serves: a dict
+# lookup, no database access.
+#
+# Each process keeps its own index and catches up incrementally: `refresh`
+# reads only orders above the last order_id it has seen. Orders younger than
+# RECS_REFRESH_LAG are left for the next refresh, so a transaction that
+# commits a little after a higher order_id is not skipped.
+#==============================================================================
+
+RECS_TOP_K = int(os.getenv("RECS_TOP_K", "10"))
+RECS_REFRESH_SECONDS = float(os.getenv("RECS_REFRESH_SECONDS", "60"))
+RECS_REFRESH_LAG = float(os.getenv("RECS_REFRESH_LAG", "30"))
+RECS_BATCH_SIZE = int(os.getenv("RECS_BATCH_SIZE", "10000"))
+RECS_MAX_BASKET = int(os.getenv("RECS_MAX_BASKET", "50"))  # larger baskets say little about affinity
+
+
+class CoPurchaseIndex:
+    def __init__(self, top_k: int = RECS_TOP_K, max_basket: int = RECS_MAX_BASKET):
+        self.top_k = top_k
+        self.max_basket = max_basket
+        self.last_order_id = 0
+        self.refreshed_at = 0.0  # time.monotonic() of the last completed refresh; 0 = never built
+        self._counts: Dict[int, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+        self._top: Dict[int, Tuple[Tuple[int, int], ...]] = {}  # game_id -> ((game_id, score), ...)
+        self._refresh_lock = threading.Lock()
+
+    def related(self, game_id: int, limit: Optional[int] = None) -> Tuple[Tuple[int, int], ...]:
+        """Precomputed (game_id, score) neighbours, best first."""
+        neighbours = self._top.get(game_id, ())
+        return neighbours[:limit] if limit else neighbours
+
+    def add_basket(self, game_ids: Set[int], touched: Set[int]):
+        if len(game_ids) < 2 or len(game_ids) > self.max_basket:
+            return
+        for a, b in combinations(sorted(game_ids), 2):
+            self._counts[a][b] += 1
+            self._counts[b][a] += 1
+        touched.update(game_ids)
+
+    def _rank(self, touched: Iterable[int]):
+        for game_id in touched:
+            neighbours = self._counts.get(game_id)
+            if neighbours:
+                # Ties go to the lower game_id so the order is stable
+                best = heapq.nlargest(self.top_k, neighbours.items(), key=lambda item: (item[1], -item[0]))
+                self._top[game_id] = tuple(best)
+
+    def refresh(self, db: Session, batch_size: int = RECS_BATCH_SIZE) -> int:
+        """Fold orders newer than last_order_id into the matrix. Returns the number of orders added."""
+        with self._refresh_lock:
+            cutoff = datetime.utcnow() - timedelta(seconds=RECS_REFRESH_LAG)
+            statement = (
+                select(models.OrderItem.order_id, models.OrderItem.game_id)
+                .join(models.Order, models.Order.order_id == models.OrderItem.order_id)
+                .where(models.OrderItem.order_id > self.last_order_id, models.Order.order_date <= cutoff)
+                .order_by(models.OrderItem.order_id)
+            )
+            orders = 0
+            touched: Set[int] = set()
+            result = db.execute(statement, execution_options={"yield_per": batch_size})
+            # An order's lines can straddle two partitions, so the last order of
+            # each partition is carried over and counted with the next one.
+            carry: List[Tuple[int, int]] = []
+            for partition in result.partitions():
+                rows = carry + list(partition)
+                last_order_id = rows[-1][0]
+                carry = [row for row in rows if row[0] == last_order_id]
+                for order_id, lines in groupby((row for row in rows if row[0] != last_order_id), key=lambda row: row[0]):
+                    self.add_basket({game_id for _, game_id in lines}, touched)
+                    self.last_order_id = order_id
+                    orders += 1
+                self._rank(touched)
+                touched.clear()
+            if carry:
+                self.add_basket({game_id for _, game_id in carry}, touched)
+                self.last_order_id = carry[0][0]
+                orders += 1
+                self._rank(touched)
+            self.refreshed_at = time.monotonic()
+        if orders:
+            logger.info("Added %s order(s); index covers orders up to #%s", orders, self.last_order_id)
+        return orders
+
+    def refresh_in_background(self) -> bool:
+        """Start a refresh on a daemon thread unless one is already running."""
+        return run_in_background(self.refresh, self._refresh_lock, "recs-refresh")
+
+    def maybe_refresh(self):
+        if time.monotonic() - self.refreshed_at >= RECS_REFRESH_SECONDS:
+            self.refresh_in_background()
+
+
+index = CoPurchaseIndex()
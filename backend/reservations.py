@@ -0,0 +1,85 @@
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from backend import models
+
+#==============================================================================
+# Time-bounded stock holds
+#
+# Adding a game to a cart holds that quantity for STOCK_HOLD_SECONDS. Holds
+# are not stored separately: a cart row created (or last changed) within the
+# hold window holds its quantity, so every worker process sees the same
+# holds. Available-to-sell is stock_quantity minus the quantity held in
+# other users' carts, summed over the (game_id, created_at) index.
+#
+# A hold is taken under a row lock on the game (`lock_stock`), so concurrent
+# add-to-cart requests for one game are checked one at a time and never hold
+# more than the stock. Stock is still checked again when the order is
+# created, so a hold is a fast-fail guard, not a guarantee.
+#==============================================================================
+
+STOCK_HOLD_SECONDS = float(os.getenv("STOCK_HOLD_SECONDS", "900"))
+
+
+def hold_cutoff() -> datetime:
+    """Cart rows created before this moment no longer hold stock."""
+    return datetime.utcnow() - timedelta(seconds=STOCK_HOLD_SECONDS)
+
+
+def held_by_game(exclude_user: Optional[int] = None):
+    """Subquery of (game_id, held) over live holds, optionally ignoring one user's own cart."""
+    statement = (
+        select(models.CartItem.game_id, func.sum(models.CartItem.quantity).label("held"))
+        .where(models.CartItem.created_at >= hold_cutoff())
+        .group_by(models.CartItem.game_id)
+    )
+    if exclude_user is not None:
+        statement = statement.where(models.CartItem.user_id != exclude_user)
+    return statement.subquery()
+
+
+def held_quantities(db: Session, game_ids: Iterable[int], exclude_user: Optional[int] = None) -> Dict[int, int]:
+    """game_id -> quantity held in carts, for the given games (missing = nothing held)."""
+    held = held_by_game(exclude_user)
+    rows = db.execute(select(held.c.game_id, held.c.held).where(held.c.game_id.in_(list(game_ids)))).all()
+    return {game_id: int(quantity) for game_id, quantity in rows}
+
+
+def lock_stock(db: Session, game_id: int) -> Optional[int]:
+    """
+    Lock a game's row until the transaction ends and return its stock, or
+    None if there is no such game. Callers commit or roll back promptly.
+    """
+    locked = db.execute(
+        update(models.Game)
+        .where(models.Game.game_id == game_id)
+        .values(stock_quantity=models.Game.stock_quantity, updated_at=models.Game.updated_at)  # no-op write, takes the lock
+        .execution_options(synchronize_session=False)
+    )
+    if locked.rowcount != 1:
+        return None
+    return db.execute(select(models.Game.stock_quantity).where(models.Game.game_id == game_id)).scalar_one()
+
+
+def can_hold(db: Session, user_id: int, game_id: int, quantity: int, stock_quantity: int) -> bool:
+    """Whether `quantity` units fit beside other users' holds. Call under `lock_stock`."""
+    if quantity <= 0:
+        return False  # a negative hold would hand its units to everyone else
+    held_by_others = held_quantities(db, [game_id], exclude_user=user_id).get(game_id, 0)
+    return quantity <= stock_quantity - held_by_others
+
+
+def available(stock_quantity: int, held: Optional[int]) -> int:
+    """Available-to-sell: stock minus holds."""
+    return max(stock_quantity - (held or 0), 0)
+
+
+def annotate_available(games: List[dict]) -> List[dict]:
+    """Replace the "held" column on game dicts (see crud.get_game_rows) with available_quantity."""
+    for game in games:
+        game["available_quantity"] = available(game["stock_quantity"], game.pop("held"))
+    return games
@@ -30,6 +30,7 @@ class GameCreate(GameBase):
 # Schema for reading/returning game information (output)
 class Game(GameBase): # Inherits from GameBase
     game_id: int
+    sale_price: Optional[Decimal] = None  # Set while a price rule is running (see backend/pricing.py)
     created_at: datetime
     updated_at: datetime
 
@@ -37,6 +38,16 @@ class Game(GameBase): # Inherits from GameBase
     class Config(GameBase.Config): # Inherit base config like json_encoders
         from_attributes = True # Ensures ORM mode compatibility
 
+# Game as returned by the catalog listing
+class GameListing(Game):
+    available_quantity: int  # Stock not held in other users' carts
+    effective_price: Decimal  # What checkout charges: the sale price during a sale, else the list price
+
+# "Customers also bought" neighbour; score = number of orders containing both games
+class RelatedGame(BaseModel):
+    game_id: int
+    score: int
+
 # Schema for updating a game (all fields optional)
 class GameUpdate(BaseModel):
     title: Optional[str] = None
@@ -129,12 +140,16 @@ class OrderCreate(BaseModel):
 
 
 
+# Admin/fulfilment status change; see crud.ORDER_TRANSITIONS for the allowed moves
+class OrderStatusUpdate(BaseModel):
+    status: str
+
 # Schema for reading an order (output to the client)
 class Order(OrderCreate):
     order_id: int
     order_date: datetime
     total_price: Decimal
-    status: str  # Add status here
+    status: str  # pending, paid, processing, shipped, delivered or cancelled
     order_items: List[OrderItem]
 
     class Config(OrderCreate.Config):  # Inherit the config and add to it.
@@ -154,7 +169,7 @@ class CartItemCreate(BaseModel):
     quantity: int
 
     class Config:
-        orm_mode = True
+        from_attributes = True
 
 class CartItemUpdate(BaseModel):
     quantity: int
@@ -171,6 +186,24 @@ class CartItem(CartItemBase):
             Decimal: lambda v: float(v)
         }
 
+class CartSummaryLine(BaseModel):
+    id: int
+    game_id: int
+    title: str
+    image_url: Optional[str] = None
+    price: float  # unit price charged at checkout (sale price during a sale)
+    list_price: float
+    quantity: int
+    line_total: float
+    stock_quantity: int
+    available: bool
+
+class CartSummary(BaseModel):
+    items: List[CartSummaryLine]
+    item_count: int
+    subtotal: float
+    all_available: bool
+
 # --- Payment Schemas ---
 
 class PaymentBase(BaseModel):
@@ -188,4 +221,86 @@ class Payment(PaymentBase):
     transaction_id: Optional[str]
 
     class Config:
-        orm_mode = True
+        from_attributes = True
+
+# --- Analytics Schemas ---
+
+class TopSeller(BaseModel):
+    game_id: int
+    title: str
+    units: int
+    revenue: Decimal
+
+    class Config:
+        json_encoders = {
+            Decimal: lambda v: float(v)
+        }
+
+class RevenuePoint(BaseModel):
+    day: date
+    units: int
+    revenue: Decimal
+    revenue_paid: Decimal
+
+    class Config:
+        json_encoders = {
+            Decimal: lambda v: float(v)
+        }
+
+class InventoryTurnover(BaseModel):
+    game_id: int
+    title: str
+    units_sold: int
+    stock_quantity: int
+    turnover: Optional[float] = None
+
+# --- Job Schemas ---
+
+class Job(BaseModel):
+    job_id: int
+    kind: str
+    payload: str
+    status: str
+    attempts: int
+    max_attempts: int
+    run_after: datetime
+    last_error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class JobQueueStats(BaseModel):
+    queued: int
+    running: int
+    done: int
+    dead: int
+    oldest_queued_seconds: float
+    avg_wait_seconds: float
+    avg_run_seconds: float
+
+# --- Price Rule Schemas ---
+
+# A sale on one game, a genre or a platform (the whole catalog when none is set)
+class PriceRuleCreate(BaseModel):
+    name: str
+    game_id: Optional[int] = None
+    genre: Optional[str] = None
+    platform: Optional[str] = None
+    percent_off: Optional[Decimal] = None  # exactly one of percent_off and fixed_price
+    fixed_price: Optional[Decimal] = None
+    starts_at: datetime
+    ends_at: datetime
+
+class PriceRule(PriceRuleCreate):
+    rule_id: int
+    status: str  # scheduled, active, ended
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+        json_encoders = {
+            Decimal: lambda v: float(v)
+        }
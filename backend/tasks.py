@@ -0,0 +1,73 @@
+from sqlalchemy.orm import Session, selectinload
+
+from backend import analytics, carts, crud, events, idempotency, jobs, models, pricing
+
+#==============================================================================
+# Post-checkout job handlers
+#
+# Follow-up work for orders and payments runs here, off the request path.
+# Handlers receive a session from the worker; the worker commits.
+#==============================================================================
+
+def _load_order(db: Session, order_id: int) -> models.Order:
+    order = (
+        db.query(models.Order)
+        .options(selectinload(models.Order.order_items).joinedload(models.OrderItem.game))
+        .filter(models.Order.order_id == order_id)
+        .first()
+    )
+    if order is None:
+        raise LookupError(f"Order {order_id} not found")
+    return order
+
+
+@jobs.job("order.created")
+def order_created(db: Session, payload: dict):
+    order = _load_order(db, payload["order_id"])
+    games = {item.game_id: item.game for item in order.order_items}
+    analytics.record_order(db, order, order.order_items, games)
+
+
+@jobs.job("payment.succeeded")
+def payment_succeeded(db: Session, payload: dict):
+    order = _load_order(db, payload["order_id"])
+    payment = db.query(models.Payment).filter(models.Payment.payment_id == payload["payment_id"]).first()
+    if payment is None:
+        raise LookupError(f"Payment {payload['payment_id']} not found")
+    if order.status.lower() != "pending":
+        return  # already applied by an earlier run of this job
+    # Rollup, status and the job's "done" all commit together in the worker
+    analytics.record_payment(db, order, payment)
+    crud.update_order_status(db=db, order_id=order.order_id, new_status="paid", commit=False)
+
+
+@jobs.job("carts.sweep")
+def sweep_expired_carts(db: Session, payload: dict):
+    carts.sweep_expired(db)
+    jobs.ensure_scheduled(db, "carts.sweep", {}, delay=carts.CART_SWEEP_INTERVAL)
+
+
+@jobs.job("pricing.apply")
+def apply_price_rules(db: Session, payload: dict):
+    pricing.apply_due_rules(db)
+    jobs.ensure_scheduled(db, "pricing.apply", {}, delay=pricing.PRICE_RULE_INTERVAL)
+
+
+@jobs.job("idempotency.purge")
+def purge_idempotency_keys(db: Session, payload: dict):
+    idempotency.purge_expired(db)
+    jobs.ensure_scheduled(db, "idempotency.purge", {}, delay=idempotency.IDEMPOTENCY_PURGE_INTERVAL)
+
+
+@jobs.job("events.purge")
+def purge_catalog_events(db: Session, payload: dict):
+    events.purge_events(db)
+    jobs.ensure_scheduled(db, "events.purge", {}, delay=events.FEED_PURGE_INTERVAL)
+
+
+def schedule_recurring(db: Session):
+    """Seed the recurring maintenance jobs (safe to call from every process)."""
+    jobs.ensure_scheduled(db, "carts.sweep", {})
+    jobs.ensure_scheduled(db, "pricing.apply", {})
+    jobs.ensure_scheduled(db, "idempotency.purge", {})
+    jobs.ensure_scheduled(db, "events.purge", {})
@@ -0,0 +1,312 @@
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+#==============================================================================
+# API and concurrency harness
+#
+#   python -m backend.testing                                   # fresh SQLite file
+#   python -m backend.testing --database-url postgresql+psycopg2://... --reset
+#
+# Boots the full app against the chosen database (DATABASE_URL), recreates
+# the schema, and runs every scenario below through the HTTP API. The
+# in-app job worker is disabled so the harness decides when jobs run.
+# `--reset` is required for anything but the default throwaway SQLite file,
+# because it drops and recreates all tables. Needs httpx (FastAPI's TestClient).
+#==============================================================================
+
+PASSWORD = "harness-password"
+
+
+def configure(database_url: str):
+    """Point the backend at `database_url`. Must run before backend.database is imported."""
+    if "backend.database" in sys.modules:
+        raise RuntimeError("configure() must be called before the backend is imported")
+    os.environ["DATABASE_URL"] = database_url
+    os.environ["JOB_CONCURRENCY"] = "0"
+    os.environ.setdefault("DB_AUTO_MIGRATE", "0")
+    # Every request comes from the same client address
+    os.environ.setdefault("LOGIN_RATE_BURST", "10000")
+    os.environ.setdefault("CART_RATE_BURST", "10000")
+
+
+def reset_schema():
+    from backend import models  # noqa: F401
+    from backend.database import Base, get_engine
+
+    Base.metadata.drop_all(bind=get_engine())
+    Base.metadata.create_all(bind=get_engine())
+
+
+class Harness:
+    def __init__(self):
+        from fastapi.testclient import TestClient
+        from backend import main
+
+        self.client = TestClient(main.create_app())
+
+    def __enter__(self):
+        self.client.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        self.client.__exit__(*exc)
+
+    def user(self, role: str = "customer") -> dict:
+        """Sign up a new user and return auth headers for them."""
+        name = f"{role}-{uuid.uuid4().hex[:8]}"
+        email = f"{name}@example.com"
+        response = self.client.post("/api/auth/signup", json={"username": name, "email": email, "password": PASSWORD, "role": role})
+        assert response.status_code == 201, response.text
+        token = self.client.post("/api/auth/token", data={"username": email, "password": PASSWORD}).json()["access_token"]
+        return {"Authorization": f"Bearer {token}"}
+
+    def game(self, admin: dict, stock: int, price: str = "19.99", genre: str = "RPG") -> int:
+        response = self.client.post("/api/games/", json={
+            "title": f"Game {uuid.uuid4().hex[:6]}", "price": price, "genre": genre,
+            "platform": "PC", "stock_quantity": stock,
+        }, headers=admin)
+        assert response.status_code == 201, response.text
+        return response.json()["game_id"]
+
+    def stock(self, game_id: int) -> int:
+        return self.client.get(f"/api/games/{game_id}").json()["stock_quantity"]
+
+
+#==============================================================================
+# Scenarios
+#==============================================================================
+
+def scenario_checkout_flow(h: Harness, admin: dict):
+    """Cart -> checkout -> payment -> jobs -> analytics, end to end."""
+    from backend import jobs
+
+    game_id = h.game(admin, stock=10)
+    customer = h.user()
+    assert h.client.post("/api/cart/add", json={"game_id": game_id, "quantity": 2}, headers=customer).status_code == 201
+    assert h.client.post("/api/cart/add", json={"game_id": game_id, "quantity": 1}, headers=customer).status_code == 201
+    summary = h.client.get("/api/cart/summary", headers=customer).json()
+    assert summary["item_count"] == 3, summary
+
+    order = h.client.post("/api/cart/checkout", headers=customer).json()
+    assert h.stock(game_id) == 7
+    payment = h.client.post("/api/payments/", json={"order_id": order["order_id"], "amount_paid": order["total_price"]}, headers=customer)
+    assert payment.status_code == 201, payment.text
+    assert h.client.get("/api/cart/", headers=customer).json() == []
+
+    jobs.run_pending()
+    sellers = h.client.get("/api/admin/analytics/top-sellers", headers=admin).json()
+    assert any(row["game_id"] == game_id and row["units"] == 3 for row in sellers), sellers
+
+
+def scenario_concurrent_orders(h: Harness, admin: dict, threads: int = 8):
+    """Parallel orders for the last units of a game must never oversell."""
+    game_id = h.game(admin, stock=threads // 2)
+    customers = [h.user() for _ in range(threads)]
+
+    def place(customer):
+        user_id = h.client.get("/api/users/me", headers=customer).json()["user_id"]
+        return h.client.post("/api/orders/", json={"user_id": user_id, "order_items": [{"game_id": game_id, "quantity": 1}]}, headers=customer).status_code
+
+    with ThreadPoolExecutor(threads) as pool:
+        codes = list(pool.map(place, customers))
+    placed = codes.count(201)
+    assert h.stock(game_id) == threads // 2 - placed >= 0, (codes, h.stock(game_id))
+
+
+def scenario_concurrent_idempotent_checkout(h: Harness, admin: dict, threads: int = 6):
+    """Retries of one checkout racing each other create exactly one order."""
+    game_id = h.game(admin, stock=5)
+    customer = h.user()
+    h.client.post("/api/cart/add", json={"game_id": game_id, "quantity": 1}, headers=customer)
+    key = {"Idempotency-Key": uuid.uuid4().hex, **customer}
+
+    with ThreadPoolExecutor(threads) as pool:
+        codes = list(pool.map(lambda _: h.client.post("/api/cart/checkout", headers=key).status_code, range(threads)))
+    orders = h.client.get("/api/orders/", headers=customer).json()
+    assert len(orders) == 1 and h.stock(game_id) == 4, (codes, orders)
+
+
+def scenario_concurrent_job_claims(h: Harness, admin: dict, jobs_count: int = 40, threads: int = 4):
+    """Several workers draining one queue run every job exactly once."""
+    from backend import jobs
+    from backend.database import SessionLocal
+
+    runs = []
+    lock = threading.Lock()
+
+    @jobs.job("harness.count")
+    def count(db, payload):
+        with lock:
+            runs.append(payload["n"])
+
+    db = SessionLocal()
+    try:
+        for n in range(jobs_count):
+            jobs.enqueue(db, "harness.count", {"n": n})
+        db.commit()
+    finally:
+        db.close()
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(lambda _: jobs.run_pending(), range(threads)))
+    assert sorted(runs) == list(range(jobs_count)), sorted(runs)
+
+
+def scenario_concurrent_rollups(h: Harness, admin: dict, orders: int = 30, threads: int = 6):
+    """Order jobs updating one (day, game) rollup in parallel lose no units."""
+    from backend import jobs
+
+    game_id = h.game(admin, stock=orders)
+    customer = h.user()
+    user_id = h.client.get("/api/users/me", headers=customer).json()["user_id"]
+    for _ in range(orders):
+        h.client.post("/api/orders/", json={"user_id": user_id, "order_items": [{"game_id": game_id, "quantity": 1}]}, headers=customer)
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(lambda _: jobs.run_pending(), range(threads)))
+    sellers = h.client.get("/api/admin/analytics/top-sellers?limit=100", headers=admin).json()
+    units = next((row["units"] for row in sellers if row["game_id"] == game_id), 0)
+    assert units == orders, (units, orders)
+
+
+def scenario_cart_holds(h: Harness, admin: dict, threads: int = 8):
+    """Parallel add-to-cart never holds more than the stock."""
+    game_id = h.game(admin, stock=3)
+    customers = [h.user() for _ in range(threads)]
+    with ThreadPoolExecutor(threads) as pool:
+        codes = list(pool.map(
+            lambda customer: h.client.post("/api/cart/add", json={"game_id": game_id, "quantity": 1}, headers=customer).status_code,
+            customers,
+        ))
+    assert codes.count(201) == 3, codes
+    listing = {game["game_id"]: game for game in h.client.get("/api/games/?fields=game_id,available_quantity").json()}
+    assert listing[game_id]["available_quantity"] == 0, listing[game_id]
+    assert h.client.post("/api/cart/add", json={"game_id": game_id, "quantity": -10}, headers=customers[-1]).status_code == 400
+
+    # Stock drops under a cart: the summary must count the other carts' holds, as checkout does
+    game_id = h.game(admin, stock=3)
+    first, second = customers[:2]
+    h.client.post("/api/cart/add", json={"game_id": game_id, "quantity": 2}, headers=first)
+    h.client.post("/api/cart/add", json={"game_id": game_id, "quantity": 1}, headers=second)
+    h.client.put(f"/api/games/{game_id}", json={"stock_quantity": 2}, headers=admin)
+    summary = h.client.get("/api/cart/summary", headers=first).json()
+    line = next(item for item in summary["items"] if item["game_id"] == game_id)
+    assert not line["available"] and not summary["all_available"], summary
+
+
+def scenario_price_rules(h: Harness, admin: dict):
+    """A genre sale reprices listing, cart and checkout at once, and ending it restores list prices."""
+    from datetime import datetime, timedelta
+
+    genre = f"Sale-{uuid.uuid4().hex[:6]}"
+    on_sale = h.game(admin, stock=5, price="40.00", genre=genre)
+    other = h.game(admin, stock=5, price="40.00")
+    now = datetime.utcnow()
+    rule = h.client.post("/api/admin/price-rules", json={
+        "name": "Weekend sale", "genre": genre, "percent_off": "25",
+        "starts_at": (now - timedelta(minutes=1)).isoformat(), "ends_at": (now + timedelta(days=2)).isoformat(),
+    }, headers=admin)
+    assert rule.status_code == 201 and rule.json()["status"] == "active", rule.text
+
+    listing = {game["game_id"]: game for game in h.client.get("/api/games/?fields=game_id,effective_price").json()}
+    assert listing[on_sale]["effective_price"] == 30.0 and listing[other]["effective_price"] == 40.0, listing
+    customer = h.user()
+    h.client.post("/api/cart/add", json={"game_id": on_sale, "quantity": 2}, headers=customer)
+    assert h.client.get("/api/cart/summary", headers=customer).json()["subtotal"] == 60.0
+    order = h.client.post("/api/cart/checkout", headers=customer).json()
+    assert float(order["total_price"]) == 60.0, order
+
+    ended = h.client.post(f"/api/admin/price-rules/{rule.json()['rule_id']}/end", headers=admin)
+    assert ended.json()["status"] == "ended", ended.text
+    game = h.client.get(f"/api/games/{on_sale}").json()
+    assert game["sale_price"] is None and game["price"] == 40.0, game
+
+
+def scenario_fulfilment_claims(h: Harness, admin: dict, orders: int = 12, threads: int = 4):
+    """Workers claiming paid orders in batches get disjoint sets; cancelling restocks."""
+    from backend import jobs
+
+    game_id = h.game(admin, stock=orders + 1)
+    customer = h.user()
+    placed = set()
+    for _ in range(orders):
+        h.client.post("/api/cart/add", json={"game_id": game_id, "quantity": 1}, headers=customer)
+        order = h.client.post("/api/cart/checkout", headers=customer).json()
+        h.client.post("/api/payments/", json={"order_id": order["order_id"], "amount_paid": order["total_price"]}, headers=customer)
+        placed.add(order["order_id"])
+    jobs.run_pending()  # payment.succeeded moves each order to paid
+
+    def drain(_):
+        mine = []
+        while True:
+            batch = h.client.post("/api/admin/orders/claim?limit=3", headers=admin).json()
+            if not batch:
+                return mine
+            mine += [order["order_id"] for order in batch]
+
+    with ThreadPoolExecutor(threads) as pool:
+        claimed = [order_id for batch in pool.map(drain, range(threads)) for order_id in batch]
+    # Earlier scenarios' paid orders are in the queue too
+    assert len(claimed) == len(set(claimed)) and placed <= set(claimed), claimed
+
+    first, second = sorted(placed)[:2]
+    shipped = h.client.put(f"/api/admin/orders/{first}/status", json={"status": "shipped"}, headers=admin)
+    assert shipped.json()["status"] == "shipped", shipped.text
+    assert h.client.put(f"/api/admin/orders/{first}/status", json={"status": "paid"}, headers=admin).status_code == 409
+    before = h.stock(game_id)
+    cancelled = h.client.put(f"/api/admin/orders/{second}/status", json={"status": "cancelled"}, headers=admin)
+    assert cancelled.json()["status"] == "cancelled" and h.stock(game_id) == before + 1, cancelled.text
+
+
+SCENARIOS = [
+    scenario_checkout_flow,
+    scenario_concurrent_orders,
+    scenario_concurrent_idempotent_checkout,
+    scenario_concurrent_job_claims,
+    scenario_concurrent_rollups,
+    scenario_cart_holds,
+    scenario_price_rules,
+    scenario_fulfilment_claims,
+]
+
+
+def run(names=None) -> int:
+    failures = 0
+    with Harness() as h:
+        admin = h.user(role="admin")
+        for scenario in SCENARIOS:
+            if names and scenario.__name__ not in names:
+                continue
+            try:
+                scenario(h, admin)
+                print(f"--- HARNESS: ok    {scenario.__name__}")
+            except AssertionError as e:
+                failures += 1
+                print(f"--- HARNESS: FAIL  {scenario.__name__}: {e}")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m backend.testing")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    parser.add_argument("--reset", action="store_true", help="drop and recreate all tables in --database-url")
+    parser.add_argument("scenarios", nargs="*", help="run only these scenario functions")
+    args = parser.parse_args(argv)
+
+    database_url = args.database_url
+    if database_url is None:
+        database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'harness.db')}"
+    elif not args.reset:
+        parser.error("--reset is required with --database-url: the harness drops and recreates all tables")
+
+    configure(database_url)
+    reset_schema()
+    print(f"--- HARNESS: Running against {database_url.split('@')[-1]}")
+    sys.exit(1 if run(args.scenarios) else 0)
+
+
+if __name__ == "__main__":
+    main()
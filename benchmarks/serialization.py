@@ -0,0 +1,64 @@
+"""
+Serialization cost per 1,000 catalog rows: the old response_model path
+(Pydantic validation of ORM objects + JSON) against the fast path (column
+tuples + orjson).
+
+    python -m benchmarks.serialization [--rows 1000] [--repeat 50]
+
+No database is needed; rows are built in memory.
+"""
+import argparse
+import json
+import timeit
+from datetime import date, datetime
+from decimal import Decimal
+from typing import List
+
+from pydantic import TypeAdapter
+
+from backend import crud, fastjson, models, schemas
+
+
+def make_rows(count: int):
+    """Tuples in crud.GAME_COLUMNS order, built by name so new columns can't shift the values."""
+    now = datetime(2025, 5, 8, 12, 0, 0)
+    rows = []
+    for i in range(1, count + 1):
+        values = {
+            "game_id": i, "title": f"Game {i}", "description": "A long enough description of the game. " * 3,
+            "price": Decimal("29.99"), "sale_price": Decimal("19.99") if i % 4 == 0 else None,
+            "genre": "RPG", "platform": "PC", "release_date": date(2020, 1, 1), "stock_quantity": 25,
+            "image_url": f"https://example.com/images/{i}.jpg", "created_at": now, "updated_at": now,
+        }
+        rows.append(tuple(values[column] for column in crud.GAME_COLUMNS))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    orm_games = [models.Game(**dict(zip(crud.GAME_COLUMNS, row))) for row in rows]
+    adapter = TypeAdapter(List[schemas.Game])
+
+    def pydantic_path():
+        # What FastAPI does for response_model=List[schemas.Game]
+        validated = adapter.validate_python(orm_games, from_attributes=True)
+        return json.dumps(adapter.dump_python(validated, mode="json")).encode()
+
+    def fast_path():
+        return fastjson.dumps(fastjson.rows_to_dicts(crud.GAME_COLUMNS, rows))
+
+    assert json.loads(pydantic_path()) == json.loads(fast_path())
+
+    scale = 1000 / args.rows
+    for name, func in (("pydantic (ORM objects)", pydantic_path), ("fast path (tuples + orjson)", fast_path)):
+        best = min(timeit.repeat(func, number=1, repeat=args.repeat))
+        print(f"{name:30s} {best * 1000 * scale:8.3f} ms per 1,000 rows")
+
+
+if __name__ == "__main__":
+    main()
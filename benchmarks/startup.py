@@ -0,0 +1,72 @@
+"""
+Cold-start cost of the backend: wall time to import `backend.main` and build
+the app in a fresh interpreter, plus the slowest imports from
+`python -X importtime`.
+
+    python -m benchmarks.startup [--runs 5] [--top 15]
+
+Runs with DB_DISABLED=1, so no database (or ODBC driver) is needed; the
+numbers are what every worker pays before it can serve a request.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+BOOT = "import time; t = time.perf_counter(); import backend.main; print(time.perf_counter() - t)"
+HEAVY_MODULES = ("pyodbc", "passlib", "bcrypt", "jose", "msgpack", "brotli")
+
+
+def _env() -> dict:
+    return {**os.environ, "DB_DISABLED": "1", "JOB_CONCURRENCY": "0"}
+
+
+def boot_times(runs: int):
+    times = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", BOOT], env=_env(), capture_output=True, text=True, check=True)
+        times.append(float(output.stdout.strip().splitlines()[-1]))
+    return times
+
+
+def import_profile():
+    """Parse `-X importtime` output into (cumulative_us, self_us, depth, module) rows."""
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import backend.main"],
+        env=_env(), capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in output.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        depth = (len(module) - len(module.lstrip()) - 1) // 2
+        rows.append((int(cumulative_us), int(self_us), depth, module.strip()))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    times = boot_times(args.runs)
+    print(f"import backend.main: median {statistics.median(times) * 1000:.1f} ms, "
+          f"min {min(times) * 1000:.1f} ms over {args.runs} cold runs")
+
+    rows = import_profile()
+    # depth 0 is backend.main itself; depth 1 is what it (and the backend modules) pull in directly
+    direct = [row for row in rows if row[2] in (1, 2) and not row[3].startswith("backend")]
+    print("\nSlowest imports pulled in by the backend (cumulative):")
+    for cumulative_us, self_us, depth, module in sorted(direct, reverse=True)[:args.top]:
+        print(f"  {cumulative_us / 1000:8.1f} ms  {module}")
+
+    loaded = {row[3] for row in rows}
+    eager = [module for module in HEAVY_MODULES if module in loaded]
+    print(f"\nHeavy optional modules imported at startup: {', '.join(eager) if eager else 'none'}")
+
+
+if __name__ == "__main__":
+    main()
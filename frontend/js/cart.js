@@ -17,15 +17,15 @@ async function fetchCart() {
     }
 
     try {
-        const response = await fetch('/api/cart/', {
+        const response = await fetch('/api/cart/summary', {
             headers: {
                 'Authorization': `Bearer ${token}`
             }
         });
 
         if (response.ok) {
-            const items = await response.json();
-            displayCartItems(items);
+            const summary = await response.json();
+            displayCartItems(summary);
         } else {
             const error = await response.json();
             showMessage(error.detail || 'Failed to fetch cart items', 'error');
@@ -71,8 +71,9 @@ async function addToCart(gameId) {
     }
 }
 
-// Update cart display
-function displayCartItems(items) {
+// Update cart display from the server-computed summary
+function displayCartItems(summary) {
+    const items = summary.items;
     cartItems = items;
     cartItemsContainer.innerHTML = '';
     
@@ -83,21 +84,18 @@ function displayCartItems(items) {
         return;
     }
 
-    let total = 0;
     items.forEach(item => {
-        const itemTotal = item.game.price * item.quantity;
-        total += itemTotal;
-
         const itemElement = document.createElement('div');
         itemElement.className = 'cart-item';
         itemElement.setAttribute('data-cart-item-id', item.id);
         
         itemElement.innerHTML = `
             <div class="item-info">
-                <img src="${item.game.image_url}" alt="${item.game.title}" class="item-image">
+                <img src="${item.image_url}" alt="${item.title}" class="item-image">
                 <div class="item-details">
-                    <h3>${item.game.title}</h3>
-                    <p class="item-price">$${item.game.price.toFixed(2)}</p>
+                    <h3>${item.title}</h3>
+                    <p class="item-price">${item.price < item.list_price ? `<s>$${item.list_price.toFixed(2)}</s> ` : ''}$${item.price.toFixed(2)}</p>
+                    ${item.available ? '' : `<p class="item-stock">Only ${item.stock_quantity} left in stock</p>`}
                 </div>
             </div>
             <div class="item-quantity">
@@ -106,7 +104,7 @@ function displayCartItems(items) {
                 <button onclick="updateQuantity(${item.id}, ${item.quantity + 1})">+</button>
             </div>
             <div class="item-total">
-                $${itemTotal.toFixed(2)}
+                $${item.line_total.toFixed(2)}
             </div>
             <button class="remove-item" onclick="removeFromCart(${item.id})">
                 <i class="fas fa-trash"></i>
@@ -115,9 +113,9 @@ function displayCartItems(items) {
         cartItemsContainer.appendChild(itemElement);
     });
 
-    cartTotal = total;
-    cartTotalElement.textContent = `$${total.toFixed(2)}`;
-    checkoutBtn.disabled = false;
+    cartTotal = summary.subtotal;
+    cartTotalElement.textContent = `$${cartTotal.toFixed(2)}`;
+    checkoutBtn.disabled = !summary.all_available;
 }
 
 // Update quantity
@@ -191,13 +189,17 @@ async function proceedToCheckout() {
         return;
     }
 
+    // One key per checkout attempt, so a retried request returns the same order/payment
+    const checkoutKey = crypto.randomUUID();
+
     try {
         // First create the order
         const orderResponse = await fetch('/api/cart/checkout', {
             method: 'POST',
             headers: {
                 'Authorization': `Bearer ${token}`,
-                'Content-Type': 'application/json'
+                'Content-Type': 'application/json',
+                'Idempotency-Key': `checkout-${checkoutKey}`
             }
         });
 
@@ -213,7 +215,8 @@ async function proceedToCheckout() {
             method: 'POST',
             headers: {
                 'Authorization': `Bearer ${token}`,
-                'Content-Type': 'application/json'
+                'Content-Type': 'application/json',
+                'Idempotency-Key': `payment-${checkoutKey}`
             },
             body: JSON.stringify({
                 order_id: order.order_id,
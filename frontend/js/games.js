@@ -21,6 +21,40 @@ async function fetchGames() {
     }
 }
 
+// Apply a catalog delta pushed by the server instead of re-fetching the list
+function applyCatalogEvent(event) {
+    const { type, ...changes } = event;
+    // Sale prices come from the server's price table: re-fetch when they may have moved
+    if (type === 'catalog.prices' || 'price' in changes) {
+        fetchGames();
+        return;
+    }
+    const index = games.findIndex(game => game.game_id === event.game_id);
+    if (type === 'game.deleted') {
+        if (index !== -1) games.splice(index, 1);
+    } else if (type === 'game.created') {
+        if (index === -1) games.push(changes);
+    } else if (index !== -1) {
+        Object.assign(games[index], changes);
+    }
+    filterGames(currentFilter);
+}
+
+// Subscribe to live price and stock updates
+function subscribeToCatalog(retryDelay = 1000) {
+    const protocol = window.location.protocol === 'https:' ? 'wss' : 'ws';
+    const socket = new WebSocket(`${protocol}://${window.location.host}/api/ws/catalog`);
+    socket.onopen = () => { retryDelay = 1000; };
+    socket.onmessage = (message) => applyCatalogEvent(JSON.parse(message.data));
+    socket.onclose = () => {
+        // Reconnect with backoff, then resync anything missed while disconnected
+        setTimeout(() => {
+            fetchGames();
+            subscribeToCatalog(Math.min(retryDelay * 2, 30000));
+        }, retryDelay);
+    };
+}
+
 // Filter games by category
 function filterGames(category) {
     currentFilter = category;
@@ -44,7 +78,7 @@ function displayGames(gamesToShow) {
             <div class="game-info">
                 <h3 class="game-title">${game.title}</h3>
                 <p class="game-description">${game.description}</p>
-                <p class="game-price">$${game.price.toFixed(2)}</p>
+                <p class="game-price">${game.effective_price < game.price ? `<s>$${game.price.toFixed(2)}</s> ` : ''}$${(game.effective_price ?? game.price).toFixed(2)}</p>
                 <button class="add-to-cart" onclick="addToCart(${game.game_id}, event)">
                     Add to Cart
                 </button>
@@ -85,16 +119,15 @@ async function addToCart(gameId, event) {
             showMessage('Game added to cart successfully!', 'success');
             
             // Update cart count
-            const cartResponse = await fetch('/api/cart/', {
+            const cartResponse = await fetch('/api/cart/summary', {
                 headers: {
                     'Authorization': `Bearer ${token}`
                 }
             });
             
             if (cartResponse.ok) {
-                const cartData = await cartResponse.json();
-                const cartCount = cartData.reduce((total, item) => total + item.quantity, 0);
-                updateCartCount(cartCount);
+                const summary = await cartResponse.json();
+                updateCartCount(summary.item_count);
             }
         } else {
             const error = await response.json();
@@ -128,6 +161,7 @@ function updateCartCount(count) {
 // Event listeners
 document.addEventListener('DOMContentLoaded', () => {
     fetchGames();
+    subscribeToCatalog();
     if (categoryFilters) {
         categoryFilters.addEventListener('click', (e) => {
             if (e.target.classList.contains('filter-btn')) {